@@ -1,21 +1,30 @@
-import os, json
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify
-from models import db, User, Event, Booking
-from forms import EventForm
+import os, json, time
+import click
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, Response, stream_with_context
+from models import db, User, Event, Booking, InboxMessage
+from forms import EventForm, EventImportForm, available_dates_error
+import metrics
+import sqlwatch
+import migrations
+import occupancy
+import availability
+import rollups
+import exports
+import event_import
+import cache
+import notifications
+import ratelimit
+import archive
+import projections
+import compression
+import assets
+from metrics import timed
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from dotenv import load_dotenv
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from datetime import datetime
-from flask import send_file
-import io
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from datetime import datetime, date
+from flask import send_file, abort
+from datetime import datetime, date, timedelta
+from sqlalchemy.orm import make_transient_to_detached
 
 load_dotenv()
 
@@ -28,6 +37,18 @@ db.init_app(app)
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
+metrics.init_app(app)
+compression.init_app(app)
+assets.init_app(app)
+sqlwatch.init_app(app)
+availability.configure(int(os.getenv('AVAILABILITY_TTL', '60')),
+                       int(os.getenv('AVAILABILITY_MAX_MONTHS', '24')))
+cache.init_app(app)
+app.config['STATS_CACHE_TTL'] = int(os.getenv('STATS_CACHE_TTL', '30'))
+# unpaid bookings give their venue/date back after this long
+app.config['BOOKING_HOLD_MINUTES'] = int(os.getenv('BOOKING_HOLD_MINUTES', '30'))
+notifications.init_app(app)
+ratelimit.init_app(app)
 
 # ------------------ ACTIVITY LOGGER (no DB changes) ------------------
 # location for log file (app root)
@@ -61,7 +82,7 @@ def log_activity(kind, text):
     ensure_log_file()
     ts = datetime.utcnow().isoformat()
     line = f"{ts}||{kind}||{text}\n"
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
+    with timed("log_write"), open(LOG_FILE, "a", encoding="utf-8") as f:
         f.write(line)
 
 def read_recent_activity(limit=20):
@@ -70,7 +91,7 @@ def read_recent_activity(limit=20):
     { type, icon, text, time } with time in local human-readable form.
     """
     ensure_log_file()
-    with open(LOG_FILE, "r", encoding="utf-8") as f:
+    with timed("log_read"), open(LOG_FILE, "r", encoding="utf-8") as f:
         lines = [l.strip() for l in f if l.strip()]
     if not lines:
         return []
@@ -93,9 +114,24 @@ def read_recent_activity(limit=20):
     return items
 # --------------------------------------------------------------------
 
+def row_dict(obj, exclude=()):
+    """Column values of a model instance, as stored in the cache."""
+    return {c.key: getattr(obj, c.key) for c in obj.__table__.columns if c.key not in exclude}
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Cached as plain columns; rebuilt as a detached instance and merged without a SELECT.
+    # The password hash stays out of the cache: reading user.password loads it from the db.
+    def load():
+        user = User.query.get(int(user_id))
+        return user and row_dict(user, exclude=("password",))
+
+    cols = cache.get_or_set("user", user_id, load)
+    if cols is None:
+        return None
+    user = User(**cols)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
 
 def seed_events():
     if Event.query.count() == 0:
@@ -112,7 +148,7 @@ def seed_events():
                 available_dates=ad({
                     "Conference Hall A": ["2026-02-10", "2026-02-15", "2026-02-20", "2026-02-25", "2026-02-28"],
                     "Auditorium 2": ["2026-02-12", "2026-02-18", "2026-02-22", "2026-02-27", "2026-03-03"],
-                    "Seminar Room 5": ["2026-02-11", "2026-02-19", "2026-02-23", "2026-02-29", "2026-03-04"],
+                    "Seminar Room 5": ["2026-02-11", "2026-02-19", "2026-02-23", "2026-02-28", "2026-03-04"],
                     "VIP Lounge": ["2026-02-14", "2026-02-22", "2026-02-26", "2026-03-02", "2026-03-06"],
                     "Sky Deck": ["2026-02-13", "2026-02-21", "2026-02-24", "2026-02-28", "2026-03-05"]
                 })
@@ -351,33 +387,162 @@ def seed_events():
 def create_tables():
     db.create_all()
     if not User.query.filter_by(email='admin@events.local').first():
-        admin = User(name='Admin', email='admin@events.local', password=bcrypt.generate_password_hash('admin123').decode('utf-8'), is_admin=True)
+        with timed("bcrypt_hash"):
+            hashed = bcrypt.generate_password_hash('admin123').decode('utf-8')
+        admin = User(name='Admin', email='admin@events.local', password=hashed, is_admin=True)
         db.session.add(admin)
         db.session.commit()
     seed_events()
     ensure_log_file()
 
-def attach_upcoming_status(bookings):
-    today = date.today()
-    for booking in bookings:
-        try:
-            event_date = datetime.strptime(booking.date, '%Y-%m-%d').date()
-            booking.is_upcoming = event_date >= today
-        except Exception:
-            booking.is_upcoming = False
-    return bookings
+@app.cli.command("migrate-booking-dates")
+@click.option("--apply", is_flag=True, help="Write the conversion (default is a dry run).")
+def migrate_booking_dates_command(apply):
+    """Convert booking.date strings to a DATE column, reporting bad values."""
+    converted, bad = migrations.migrate_booking_dates(apply=apply)
+    for booking_id, raw in bad:
+        click.echo(f"booking #{booking_id}: unparseable date {raw!r}")
+    click.echo(f"{len(converted)} value(s) to normalise, {len(bad)} bad value(s)")
+    if bad:
+        click.echo("Nothing written: fix or delete the bad bookings and re-run.")
+    elif apply:
+        click.echo("Migration applied.")
+    else:
+        click.echo("Dry run; re-run with --apply to write.")
+
+@app.cli.command("clean-event-dates")
+@click.option("--apply", is_flag=True, help="Write the cleanup (default is a dry run).")
+def clean_event_dates_command(apply):
+    """Remove invalid dates (e.g. 2026-02-29) from events' available_dates."""
+    dropped, unreadable = migrations.clean_event_dates(apply=apply)
+    for event_id, venue, raw in dropped:
+        click.echo(f"event #{event_id}: {venue}: dropping {raw!r}")
+    for event_id in unreadable:
+        click.echo(f"event #{event_id}: available_dates is not a venue -> dates mapping; fix it by hand")
+    click.echo(f"{len(dropped)} invalid date(s), {len(unreadable)} unreadable event(s)")
+    if apply and dropped:
+        cache.bump("catalog")
+        click.echo("Cleanup applied.")
+    elif not apply:
+        click.echo("Dry run; re-run with --apply to write.")
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    """Write content-hashed, precompressed copies of static files to static/dist."""
+    manifest = assets.build(app.static_folder)
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f"{name} -> {hashed}")
+    click.echo(f"{len(manifest)} file(s); restart the app to serve them")
+
+@app.cli.command("expire-unpaid-bookings")
+def expire_unpaid_bookings_command():
+    """Reject bookings left unpaid for BOOKING_HOLD_MINUTES and free their slots (run from cron)."""
+    n = expire_unpaid_bookings()
+    click.echo(f"{n} unpaid booking(s) expired")
+
+@app.cli.command("upgrade-db")
+def upgrade_db_command():
+    """Create missing tables, add new nullable columns and stop booking ids being reused."""
+    added = migrations.add_missing_columns()
+    for name in added:
+        click.echo(f"added {name}")
+    click.echo(f"{len(added)} column(s) added")
+    rebuilt, clashes = migrations.monotonic_booking_ids()
+    if rebuilt:
+        click.echo("rebuilt booking table with AUTOINCREMENT ids")
+    for booking_id in clashes:
+        click.echo(f"booking #{booking_id} is also in the archive (id reused before this upgrade)")
+
+@app.cli.command("backfill-rollups")
+@click.option("--start", default=None, help="First day to rebuild (YYYY-MM-DD); default everything.")
+@click.option("--end", default=None, help="Last day to rebuild (YYYY-MM-DD).")
+def backfill_rollups_command(start, end):
+    """Recompute the daily revenue/booking rollups from the bookings table."""
+    start = date.fromisoformat(start) if start else None
+    end = date.fromisoformat(end) if end else None
+    n = rollups.rebuild(start, end)
+    click.echo(f"{n} rollup row(s) written")
+
+@app.cli.command("check-venue-collisions")
+@click.option("--rebuild", is_flag=True, help="Also regenerate the venue occupancy index from bookings.")
+def check_venue_collisions_command(rebuild):
+    """Report venue/date slots booked by more than one event."""
+    collisions = occupancy.find_collisions(rebuild=rebuild)
+    for c in collisions:
+        others = ", ".join(f"#{e}" for e in c["other_event_ids"])
+        click.echo(f"{c['date']} {c['venue_key']}: held by event #{c['holder_event_id']}, also booked by {others}")
+    click.echo(f"{len(collisions)} collision(s)")
+    if rebuild:
+        click.echo("Occupancy index rebuilt.")
+
+@app.cli.command("import-events")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--dry-run", is_flag=True, help="Validate every row without writing anything.")
+@click.option("--batch", default=event_import.BATCH_ROWS, show_default=True, help="Rows per INSERT batch.")
+def import_events_command(path, dry_run, batch):
+    """Bulk-import events from a CSV, JSON or NDJSON file."""
+    fmt = event_import.detect_format(path)
+    if fmt is None:
+        raise click.BadParameter("file must end in .csv, .json or .ndjson", param_hint="PATH")
+    with open(path, "rb") as f:
+        report = event_import.import_events(f, fmt, dry_run=dry_run, batch_size=batch)
+    availability.invalidate()
+    cache.bump("catalog")
+    for row_no, message in report.errors:
+        click.echo(f"row {row_no}: {message}")
+    if report.failed > len(report.errors):
+        click.echo(f"... and {report.failed - len(report.errors)} more error(s)")
+    if report.fatal:
+        click.echo(f"Stopped: {report.fatal}")
+    verb = "would be imported" if dry_run else "imported"
+    click.echo(f"{report.rows} row(s) read, {report.imported} {verb}, {report.failed} rejected")
+
+@app.cli.command("send-notifications")
+@click.option("--loop", is_flag=True, help="Keep polling instead of exiting once the outbox is drained.")
+@click.option("--interval", default=5.0, show_default=True, help="Seconds between polls with --loop.")
+def send_notifications_command(loop, interval):
+    """Deliver pending booking notifications from the outbox."""
+    while True:
+        counts = notifications.drain()
+        if counts or not loop:
+            click.echo(", ".join(f"{n} {result}" for result, n in sorted(counts.items())) or "nothing to send")
+        if not loop:
+            return
+        time.sleep(interval)
+
+@app.cli.command("archive-bookings")
+@click.option("--retention-days", type=int, default=archive.DEFAULT_RETENTION_DAYS, envvar="ARCHIVE_RETENTION_DAYS",
+              show_default=True, help="Keep bookings dated within this many days in the hot table.")
+@click.option("--batch", default=archive.BATCH, show_default=True, help="Bookings moved per transaction.")
+@click.option("--dry-run", is_flag=True, help="Only count the bookings that would be moved.")
+def archive_bookings_command(retention_days, batch, dry_run):
+    """Move bookings for past dates into the booking archive."""
+    n = archive.archive_bookings(retention_days, batch, dry_run)
+    click.echo(f"{n} booking(s) {'due for archival' if dry_run else 'archived'}")
+
+def filter_by_when(query, when, default_order=None):
+    """Apply the ?when=upcoming|past filter in SQL; upcoming soonest first, past latest first."""
+    if when == 'upcoming':
+        return query.filter(Booking.is_upcoming).order_by(Booking.date.asc(), Booking.id.asc())
+    if when == 'past':
+        return query.filter(~Booking.is_upcoming).order_by(Booking.date.desc(), Booking.id.desc())
+    return query.order_by(default_order) if default_order is not None else query
 
 @app.route('/')
 def home():
     selected_category = request.args.get('category','').strip()
-    if selected_category:
-        events = Event.query.filter_by(category=selected_category).all()
-    else:
-        events = Event.query.all()
-    categories = [c[0] for c in db.session.query(Event.category).distinct().all()]
+
+    def load_events():
+        query = Event.query.filter_by(category=selected_category) if selected_category else Event.query
+        return [row_dict(e) for e in query.all()]
+
+    events = cache.get_or_set("catalog", f"home:{selected_category}", load_events)
+    categories = cache.get_or_set("catalog", "categories",
+                                  lambda: [c[0] for c in db.session.query(Event.category).distinct().all()])
     return render_template('home.html', events=events, categories=categories, selected_category=selected_category)
 
 @app.route('/register', methods=['GET','POST'])
+@ratelimit.limit('register')
 def register():
     if request.method == 'POST':
         name = request.form['name']
@@ -386,7 +551,8 @@ def register():
         if User.query.filter_by(email=email).first():
             flash('Email already registered', 'warning')
             return redirect(url_for('register'))
-        hashed = bcrypt.generate_password_hash(pw).decode('utf-8')
+        with timed("bcrypt_hash"):
+            hashed = bcrypt.generate_password_hash(pw).decode('utf-8')
         user = User(name=name, email=email, password=hashed)
         db.session.add(user)
         db.session.commit()
@@ -399,15 +565,19 @@ def register():
     return render_template('register.html')
 
 @app.route('/login', methods=['GET','POST'])
+@ratelimit.limit('login')
 def login():
     if request.method == 'POST':
         email = request.form['email']
         pw = request.form['password']
         user = User.query.filter_by(email=email).first()
-        if user and bcrypt.check_password_hash(user.password, pw):
+        with timed("bcrypt_check"):
+            ok = bool(user) and bcrypt.check_password_hash(user.password, pw)
+        if ok:
             login_user(user)
             user.last_login = datetime.utcnow()
             db.session.commit()
+            cache.delete("user", str(user.id))
 
             # log login
             log_activity("login", f"User logged in: {user.name} ({user.email})")
@@ -429,14 +599,35 @@ def logout():
 
 @app.route('/events/<int:event_id>')
 def event_detail(event_id):
-    event = Event.query.get_or_404(event_id)
+    def load_event():
+        event = Event.query.get(event_id)
+        return event and row_dict(event)
+
+    event = cache.get_or_set("catalog", f"event:{event_id}", load_event)
+    if event is None:
+        abort(404)
     available_dates = {}
     try:
-        available_dates = json.loads(event.available_dates or "{}")
+        available_dates = json.loads(event["available_dates"] or "{}")
     except Exception:
         available_dates = {}
     return render_template('event_detail.html', event=event, available_dates=available_dates)
 
+@app.route('/api/availability')
+@ratelimit.limit('api_availability')
+def api_availability():
+    """Open/booked/blocked days per event and venue for ?month=YYYY-MM (default: this month)."""
+    month = request.args.get('month', '').strip() or date.today().strftime('%Y-%m')
+    try:
+        year, mon = (int(x) for x in month.split('-'))
+        date(year, mon, 1)
+    except ValueError:
+        return jsonify({'error': 'month must look like YYYY-MM'}), 400
+    if not availability.in_window(year, mon):
+        return jsonify({'error': f'month must be within {availability.PAST_MONTHS} months before '
+                                 f'and {availability.FUTURE_MONTHS} months after this one'}), 400
+    return app.response_class(availability.month_payload(year, mon), mimetype='application/json')
+
 @app.route('/book/<int:event_id>', methods=['GET','POST'])
 @login_required
 def book_event(event_id):
@@ -448,26 +639,88 @@ def book_event(event_id):
         av = {}
     venues = list(av.keys())
     if request.method == 'POST':
-        date = request.form['date']
+        try:
+            booking_date = datetime.strptime(request.form['date'], '%Y-%m-%d').date()
+        except ValueError:
+            flash('Please pick a valid date.', 'warning')
+            return redirect(url_for('book_event', event_id=event.id))
         venue = request.form['venue']
         day = request.form.get('day', '')
-        booking = Booking(user_id=current_user.id, event_id=event.id, date=date, venue=venue, day=day)
+        if booking_date.isoformat() not in [str(d) for d in av.get(venue) or []]:
+            flash(f'{event.name} is not offered at {venue} on {booking_date}.', 'warning')
+            return redirect(url_for('book_event', event_id=event.id))
+        holder = occupancy.claim(venue, booking_date, event.id)
+        if holder is not None and expire_unpaid_bookings(venue, booking_date):
+            # the other event only held the slot with bookings nobody paid for
+            holder = occupancy.claim(venue, booking_date, event.id)
+        if holder is not None:
+            db.session.rollback()
+            flash(f'{venue} is already booked on {booking_date} for another event. Please pick another date or venue.', 'warning')
+            return redirect(url_for('book_event', event_id=event.id))
+        booking = Booking(user_id=current_user.id, event_id=event.id, date=booking_date, venue=venue, day=day)
         db.session.add(booking)
+        rollups.bump(event, venue, bookings=1)
         db.session.commit()
 
+        availability.record_booking(event.id, venue, booking_date, +1)
+
         # log booking creation
-        log_activity("booking", f"{current_user.name} created booking #{booking.id} for {event.name} on {date} at {venue}")
+        log_activity("booking", f"{current_user.name} created booking #{booking.id} for {event.name} on {booking_date} at {venue}")
 
         flash('Booking created and is pending payment + admin approval.', 'info')
         return redirect(url_for('user_dashboard'))
     return render_template('booking.html', event=event, venues=venues, available_dates=av)
 
+def expire_unpaid_bookings(venue=None, day=None):
+    """
+    Reject Pending bookings left unpaid for BOOKING_HOLD_MINUTES, releasing
+    their venue/date hold; optionally only those on one slot. Returns how
+    many expired. Commits.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=app.config['BOOKING_HOLD_MINUTES'])
+    q = Booking.query.filter(Booking.status == 'Pending', Booking.paid == False, Booking.created_at < cutoff)
+    if venue is not None:
+        q = q.filter(Booking.date == day)
+    expired = q.all()
+    if venue is not None:
+        # compare keys in Python, as occupancy does: SQL lower()/trim() are ASCII-only
+        expired = [b for b in expired if occupancy.venue_key(b.venue) == occupancy.venue_key(venue)]
+    reason = f"Payment was not received within {app.config['BOOKING_HOLD_MINUTES']} minutes."
+    for booking in expired:
+        occupancy.release(booking.venue, booking.date, booking.event_id)
+        rollups.bump(booking.event, booking.venue, rejected=1)
+        booking.status = 'Rejected'
+        booking.rejection_reason = reason
+        booking.decided_at = datetime.utcnow()
+        notifications.enqueue(booking, "booking_rejected", reason=reason, refund=0)
+    if expired:
+        db.session.commit()
+        for booking in expired:
+            availability.record_booking(booking.event_id, booking.venue, booking.date, -1)
+        notifications.wake()
+        cache.bump("stats")
+    return len(expired)
+
 @app.route('/user/dashboard')
 @login_required
 def user_dashboard():
-    bookings = Booking.query.filter_by(user_id=current_user.id).all()
-    bookings = attach_upcoming_status(bookings)
-    return render_template('user_dashboard.html', bookings=bookings)
+    when = request.args.get('when', '')
+    bookings = projections.booking_rows(filter_by_when(Booking.query.filter_by(user_id=current_user.id), when))
+    if when != 'upcoming':
+        bookings += projections.archived_booking_rows(current_user.id)
+    inbox = InboxMessage.query.filter_by(user_id=current_user.id) \
+                              .order_by(InboxMessage.created_at.desc(), InboxMessage.id.desc()) \
+                              .limit(10).all()
+    unread = sum(1 for m in inbox if m.read_at is None)
+    return render_template('user_dashboard.html', bookings=bookings, when=when, inbox=inbox, unread=unread)
+
+@app.route('/user/inbox/read', methods=['POST'])
+@login_required
+def mark_inbox_read():
+    InboxMessage.query.filter_by(user_id=current_user.id, read_at=None) \
+                      .update({"read_at": datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return redirect(url_for('user_dashboard'))
 
 @app.route('/pay/<int:booking_id>', methods=['GET'])
 @login_required
@@ -489,25 +742,26 @@ def profile():
             flash('New passwords do not match.', 'warning')
             return redirect(url_for('profile'))
 
-        hashed_password = bcrypt.generate_password_hash(new_pw).decode('utf-8')
-        current_user.password = hashed_password
+        with timed("bcrypt_hash"):
+            hashed_password = bcrypt.generate_password_hash(new_pw).decode('utf-8')
+        user = db.session.get(User, current_user.id)
+        user.password = hashed_password
         db.session.commit()
+        cache.delete("user", str(current_user.id))
         
         flash('Your password has been updated successfully!', 'success')
         return redirect(url_for('profile'))
 
     # ---------- STATS ----------
-    total_bookings = Booking.query.filter_by(user_id=current_user.id).count()
-    paid_bookings = Booking.query.filter_by(user_id=current_user.id, paid=True).count()
+    # history spans the hot table and the archive; upcoming bookings are never archived
+    total_bookings, paid_bookings = archive.user_booking_counts(current_user.id)
     upcoming = Booking.query.filter(
         Booking.user_id == current_user.id,
-        Booking.date >= datetime.now().strftime("%Y-%m-%d")
+        Booking.is_upcoming
     ).count()
 
     # ---------- ACTIVITY LOG ----------
-    activity_log = Booking.query.filter_by(user_id=current_user.id) \
-                                .order_by(Booking.created_at.desc()) \
-                                .limit(10).all()
+    activity_log = archive.recent_user_bookings(current_user.id, 10)
 
     return render_template(
         'profile.html',
@@ -531,11 +785,18 @@ def payment_complete():
     if booking.user_id != current_user.id:
         flash('Not allowed', 'danger')
         return redirect(url_for('user_dashboard'))
-    
+
+    if booking.paid or booking.status == 'Rejected':
+        flash('This booking cannot be paid again.', 'warning')
+        return redirect(url_for('user_dashboard'))
+
     booking.paid = True
     # Create a reference based on the method chosen
     booking.payment_reference = f"FAKE-{payment_method}-{booking.id:06d}"
-    
+    booking.amount = booking.event.price
+    booking.paid_at = datetime.utcnow()
+    rollups.bump(booking.event, booking.venue, paid=1, revenue=booking.amount)
+
     db.session.commit()
 
     # log payment
@@ -547,12 +808,15 @@ def payment_complete():
 
 ################################################
 @app.route('/admin/login', methods=['GET','POST'])
+@ratelimit.limit('admin_login')
 def admin_login():
     if request.method == 'POST':
         email = request.form['email']
         pw = request.form['password']
         user = User.query.filter_by(email=email, is_admin=True).first()
-        if user and bcrypt.check_password_hash(user.password, pw):
+        with timed("bcrypt_check"):
+            ok = bool(user) and bcrypt.check_password_hash(user.password, pw)
+        if ok:
             login_user(user)
 
             # log admin login
@@ -570,11 +834,10 @@ def admin_dashboard():
     if not current_user.is_authenticated or not current_user.is_admin:
         flash('Admin access only', 'danger')
         return redirect(url_for('home'))
-    events = Event.query.all()
-    bookings = Booking.query.order_by(Booking.id.desc()).all()
-    bookings = attach_upcoming_status(bookings)
-    
-    return render_template('admin_dashboard.html', events=events, bookings=bookings)
+    when = request.args.get('when', '')
+    bookings = projections.booking_rows(filter_by_when(Booking.query, when, default_order=Booking.id.desc()))
+
+    return render_template('admin_dashboard.html', bookings=bookings, when=when)
 
 ################################################
 
@@ -587,20 +850,11 @@ def admin_events():
     events_q = Event.query
     if q:
         events_q = events_q.filter(Event.name.ilike(f'%{q}%'))
-    events = events_q.order_by(Event.id.desc()).all()
+    events = projections.event_rows(events_q.order_by(Event.id.desc()))
     return render_template('admin_events.html', events=events, search=q)
 
-@app.route('/admin/users')
-@login_required
-def admin_users():
-    if not current_user.is_admin:
-        return redirect(url_for('home'))
-
-    search = request.args.get("search", "").strip()
-    date_from = request.args.get("date_from", "")
-    date_to = request.args.get("date_to", "")
-
-    # Only non-admin users
+def filter_users(search, date_from, date_to):
+    """Non-admin users matching the admin_users search box and date filters."""
     query = User.query.filter_by(is_admin=False)
 
     if search:
@@ -613,8 +867,19 @@ def admin_users():
         query = query.filter(User.created_at >= date_from)
     if date_to:
         query = query.filter(User.created_at <= date_to)
+    return query
 
-    users = query.order_by(User.id.desc()).all()
+@app.route('/admin/users')
+@login_required
+def admin_users():
+    if not current_user.is_admin:
+        return redirect(url_for('home'))
+
+    search = request.args.get("search", "").strip()
+    date_from = request.args.get("date_from", "")
+    date_to = request.args.get("date_to", "")
+
+    users = projections.user_rows(filter_users(search, date_from, date_to).order_by(User.id.desc()))
     total_users = len(users)
 
     return render_template(
@@ -627,6 +892,37 @@ def admin_users():
     )
 ################################################
 
+def export_response(query, fields, fmt, name):
+    encode, mimetype = exports.FORMATS[fmt]
+    return Response(
+        stream_with_context(encode(query, fields)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={name}.{fmt}"},
+    )
+
+@app.route('/admin/export/bookings.<fmt>')
+def admin_export_bookings(fmt):
+    if not current_user.is_authenticated or not current_user.is_admin:
+        flash('Admin access only', 'danger')
+        return redirect(url_for('home'))
+    if fmt not in exports.FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 404
+    when = request.args.get('when', '')
+    query = exports.bookings_query(filter_by_when(Booking.query, when, default_order=Booking.id.desc()))
+    return export_response(query, exports.BOOKING_FIELDS, fmt, "bookings")
+
+@app.route('/admin/export/users.<fmt>')
+def admin_export_users(fmt):
+    if not current_user.is_authenticated or not current_user.is_admin:
+        flash('Admin access only', 'danger')
+        return redirect(url_for('home'))
+    if fmt not in exports.FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 404
+    base = filter_users(request.args.get("search", "").strip(),
+                        request.args.get("date_from", ""), request.args.get("date_to", ""))
+    query = exports.users_query(base.order_by(User.id.desc()))
+    return export_response(query, exports.USER_FIELDS, fmt, "users")
+
 @app.route("/admin/activity")
 def admin_activity():
     if not current_user.is_authenticated or not current_user.is_admin:
@@ -636,69 +932,105 @@ def admin_activity():
     activity = read_recent_activity(100)
     return render_template('activity_page.html', activity=activity)
 
+@app.route("/admin/sql")
+def admin_sql_findings():
+    if not current_user.is_authenticated or not current_user.is_admin:
+        flash('Admin access only', 'danger')
+        return redirect(url_for('home'))
+    findings = sqlwatch.read_findings()
+    return render_template('sql_findings.html', findings=findings,
+                           slow_ms=app.config['SLOW_QUERY_MS'], nplus1=app.config['NPLUS1_THRESHOLD'])
+
+def site_stats():
+    """Counters and recent activity for the stats page and /api/stats, cached for STATS_CACHE_TTL seconds."""
+    def compute():
+        today = date.today()
+        return {
+            "total_users": User.query.count(),
+            # Active today: users whose last_login date == today
+            "active_today": User.query.filter(db.func.date(User.last_login) == today).count(),
+            "new_signups": User.query.filter(db.func.date(User.created_at) == today).count(),
+            # Total revenue: net of refunds, at the price actually charged (daily rollups)
+            "total_revenue": rollups.total_revenue(),
+            # Recent activity — read from activity.log
+            "activity": read_recent_activity(20),
+        }
+    return cache.get_or_set("stats", date.today().isoformat(), compute, ttl=app.config['STATS_CACHE_TTL'])
+
 @app.route("/stats")
 @login_required
 def stats_page():
-    # Total users
-    total_users = User.query.count()
-
-    # Active today: users whose last_login date == today
-    today = date.today()
-    active_today = 0
-    if hasattr(User, 'last_login'):
-        active_today = User.query.filter(
-            db.func.date(User.last_login) == today
-        ).count()
-
-    # New signups today
-    new_signups = 0
-    if hasattr(User, 'created_at'):
-        new_signups = User.query.filter(
-            db.func.date(User.created_at) == today
-        ).count()
-
-    # Total revenue: sum of event.price for paid bookings
-    total_revenue = db.session.query(
-        db.func.coalesce(db.func.sum(Event.price), 0)
-    ).join(Booking, Booking.event_id == Event.id).filter(Booking.paid == True).scalar() or 0
-
-    # Recent activity — read from activity.log
-    activity = read_recent_activity(20)
-
+    s = site_stats()
     return render_template(
         "stats.html",
-        total_users=total_users,
-        active_today=active_today,
-        new_signups=new_signups,
-        total_revenue=int(total_revenue),
-        activity=activity
+        total_users=s["total_users"],
+        active_today=s["active_today"],
+        new_signups=s["new_signups"],
+        total_revenue=int(s["total_revenue"]),
+        activity=s["activity"]
     )
 
 @app.route("/api/stats")
+@ratelimit.limit('api_stats')
 @login_required
 def api_stats():
-    today = date.today()
-    total_users = User.query.count()
-    active_today = User.query.filter(db.func.date(User.last_login) == today).count() if hasattr(User, 'last_login') else 0
-    new_signups = User.query.filter(db.func.date(User.created_at) == today).count() if hasattr(User, 'created_at') else 0
-    total_revenue = db.session.query(db.func.coalesce(db.func.sum(Event.price), 0)).join(Booking, Booking.event_id == Event.id).filter(Booking.paid == True).scalar() or 0
+    s = site_stats()
 
     # activity as JSON built from activity.log
-    recent_logs = read_recent_activity(20)
     activity_json = [{
         "icon": it["icon"],
         "text": it["text"],
         "time": it["time"]
-    } for it in recent_logs]
+    } for it in s["activity"]]
 
     return jsonify({
-        "total_users": total_users,
-        "active_today": active_today,
-        "new_signups": new_signups,
-        "total_revenue": int(total_revenue),
+        "total_users": s["total_users"],
+        "active_today": s["active_today"],
+        "new_signups": s["new_signups"],
+        "total_revenue": int(s["total_revenue"]),
         "activity": activity_json
     })
 
+def venue_conflicts(form, event_id=None):
+    """
+    Check the form's available_dates against venue/date slots already held by
+    bookings for other events. Adds a form error and returns True on conflict.
+    """
+    try:
+        parsed = json.loads(form.available_dates.data or "{}")
+    except ValueError:
+        return False
+    if not isinstance(parsed, dict):
+        return False
+    clashes = occupancy.conflicts_for_dates(parsed, event_id)
+    if not clashes:
+        return False
+    shown = ", ".join(f"{v} on {d} (event #{e})" for v, d, e in clashes[:5])
+    more = f" and {len(clashes) - 5} more" if len(clashes) > 5 else ""
+    form.available_dates.errors.append(f"Already booked for another event: {shown}{more}")
+    return True
+
+@app.route("/api/analytics")
+@login_required
+def api_analytics():
+    """Booking/revenue totals from the daily rollups: ?from=&to=YYYY-MM-DD&group=day|event|category|venue"""
+    if not current_user.is_admin:
+        return jsonify({'error': 'admin access only'}), 403
+    group = request.args.get('group', 'day')
+    if group not in rollups.GROUPS:
+        return jsonify({'error': f"group must be one of {', '.join(rollups.GROUPS)}"}), 400
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'from/to must look like YYYY-MM-DD'}), 400
+    return jsonify({
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'group': group,
+        'rows': rollups.query(start, end, group),
+    })
+
 # --- admin add/edit/delete events: log these actions (optional) ---
 @app.route('/admin/event/add', methods=['GET','POST'])
 def admin_add_event():
@@ -706,18 +1038,37 @@ def admin_add_event():
         flash('Admin access only', 'danger')
         return redirect(url_for('home'))
     form = EventForm()
-    if form.validate_on_submit():
+    if form.validate_on_submit() and not venue_conflicts(form):
         ed = form.available_dates.data.strip()
         event = Event(name=form.name.data.strip(), category=form.category.data.strip(), price=form.price.data, available_days=form.available_days.data.strip(), available_venues=form.available_venues.data.strip(), available_dates=ed)
         db.session.add(event)
         db.session.commit()
 
+        availability.invalidate()
+        cache.bump("catalog")
         log_activity("event", f"Event added: {event.name} by {current_user.name}")
 
         flash('Event added', 'success')
         return redirect(url_for('admin_events'))
     return render_template('add_event.html', form=form)
 
+@app.route('/admin/events/import', methods=['GET','POST'])
+def admin_import_events():
+    if not current_user.is_authenticated or not current_user.is_admin:
+        flash('Admin access only', 'danger')
+        return redirect(url_for('home'))
+    form = EventImportForm()
+    report = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        report = event_import.import_events(upload.stream, event_import.detect_format(upload.filename),
+                                            dry_run=form.dry_run.data)
+        if report.imported and not report.dry_run:
+            availability.invalidate()
+            cache.bump("catalog")
+            log_activity("event", f"Events imported: {report.imported} from {upload.filename} by {current_user.name}")
+    return render_template('import_events.html', form=form, report=report)
+
 @app.route('/admin/event/edit/<int:event_id>', methods=['GET','POST'])
 def admin_edit_event(event_id):
     if not current_user.is_authenticated or not current_user.is_admin:
@@ -727,7 +1078,7 @@ def admin_edit_event(event_id):
     form = EventForm(obj=event)
     if request.method == 'GET':
         form.available_dates.data = event.available_dates or '{}'
-    if form.validate_on_submit():
+    if form.validate_on_submit() and not venue_conflicts(form, event.id):
         old_name = event.name
         event.name = form.name.data.strip()
         event.category = form.category.data.strip()
@@ -737,6 +1088,8 @@ def admin_edit_event(event_id):
         event.available_dates = form.available_dates.data.strip()
         db.session.commit()
 
+        availability.invalidate()
+        cache.bump("catalog")
         log_activity("event", f"Event edited: {old_name} -> {event.name} by {current_user.name}")
 
         flash('Event updated', 'success')
@@ -750,9 +1103,12 @@ def admin_delete_event(event_id):
         return redirect(url_for('home'))
     event = Event.query.get_or_404(event_id)
     name = event.name
+    occupancy.release_event(event.id)
     db.session.delete(event)
     db.session.commit()
 
+    availability.invalidate()
+    cache.bump("catalog")
     log_activity("event", f"Event deleted: {name} by {current_user.name}")
 
     flash('Event deleted', 'info')
@@ -764,8 +1120,16 @@ def admin_approve(booking_id):
         flash('Admin access only', 'danger')
         return redirect(url_for('home'))
     booking = Booking.query.get_or_404(booking_id)
+    newly_approved = booking.status != 'Approved'
+    if newly_approved:
+        booking.decided_at = datetime.utcnow()
+        rollups.bump(booking.event, booking.venue, approved=1)
     booking.status = 'Approved'
+    if newly_approved:
+        notifications.enqueue(booking, "booking_approved")
     db.session.commit()
+    notifications.wake()
+    cache.bump("stats")
 
     # log approval with payment info
     log_activity("approve", f"Booking #{booking.id} APPROVED by admin. User: {booking.user.email}. Paid: {'Yes' if booking.paid else 'No'}. Ref: {booking.payment_reference or '-'}")
@@ -790,8 +1154,19 @@ def admin_reject(booking_id):
     previously_paid = booking.paid
     prev_ref = booking.payment_reference
 
+    refund = (booking.amount if booking.amount is not None else booking.event.price) if previously_paid else 0
+    if booking.status != 'Rejected':
+        occupancy.release(booking.venue, booking.date, booking.event_id)
+        booking.decided_at = datetime.utcnow()
+        if previously_paid:
+            rollups.bump(booking.event, booking.venue, rejected=1, refunded=1, revenue=-refund)
+        else:
+            rollups.bump(booking.event, booking.venue, rejected=1)
+    newly_rejected = booking.status != 'Rejected'
     booking.status = 'Rejected'
     booking.rejection_reason = reason
+    if newly_rejected:
+        notifications.enqueue(booking, "booking_rejected", reason=reason, refund=refund)
 
     # Prevent user from paying for a rejected booking / mark refunded semantics
     if previously_paid:
@@ -802,11 +1177,16 @@ def admin_reject(booking_id):
 
         log_activity("reject", f"Booking #{booking.id} REJECTED by admin. Reason: {reason}. Previously paid: Yes. Refunded (simulated). PrevRef: {prev_ref}")
         # also a separate refunded entry
-        log_activity("refunded", f"Refund simulated for booking #{booking.id} (user {booking.user.email}) amount ₹{booking.event.price:.2f}")
+        log_activity("refunded", f"Refund simulated for booking #{booking.id} (user {booking.user.email}) amount ₹{refund:.2f}")
     else:
         db.session.commit()
         log_activity("reject", f"Booking #{booking.id} REJECTED by admin. Reason: {reason}. Previously paid: No.")
 
+    # only once committed, or a failed commit would leave the slot shown as free
+    if newly_rejected:
+        availability.record_booking(booking.event_id, booking.venue, booking.date, -1)
+    notifications.wake()
+    cache.bump("stats")
     flash('Booking has been rejected.', 'info')
     return redirect(url_for('admin_dashboard'))
 
@@ -815,20 +1195,20 @@ def _validate_dates():
     import json as _json
     text = request.form.get('text','')
     try:
-        parsed = _json.loads(text)
-        if not isinstance(parsed, dict):
-            return jsonify({'ok':False, 'error':'JSON must be an object mapping venue->dates list'})
-        for k,v in parsed.items():
-            if not isinstance(v, list):
-                return jsonify({'ok':False, 'error':'Each venue must map to a list of date strings'})
+        error = available_dates_error(_json.loads(text))
+        if error:
+            return jsonify({'ok':False, 'error':error})
         return jsonify({'ok':True})
     except Exception as e:
         return jsonify({'ok':False, 'error': str(e)})
 
 @app.route("/download_receipt/<int:booking_id>")
+@ratelimit.limit('download_receipt')
 @login_required
 def download_receipt(booking_id):
-    booking = Booking.query.get_or_404(booking_id)
+    booking = archive.get_booking(booking_id)
+    if booking is None:
+        abort(404)
 
     if booking.user_id != current_user.id:
         flash("Unauthorized access!", "danger")
@@ -838,141 +1218,8 @@ def download_receipt(booking_id):
         flash("You can download receipt only after payment.", "warning")
         return redirect(url_for("user_dashboard"))
 
-    # (receipt generation unchanged)
-    buffer = io.BytesIO()
-
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=40, leftMargin=40,
-        topMargin=60, bottomMargin=40
-    )
-
-    styles = getSampleStyleSheet()
-    normal = styles["Normal"]
-    normal.fontName = "Helvetica"
-    normal.fontSize = 11
-    normal.leading = 14
-
-    PRIMARY = colors.HexColor("#5b2c6f")
-    DARKGREY = colors.HexColor("#2c2c2c")
-    LIGHTGREY = colors.HexColor("#f2f2f2")
-
-    title_style = ParagraphStyle(
-        name="TitleStyle",
-        fontName="Helvetica-Bold",
-        fontSize=22,
-        leading=26,
-        textColor=PRIMARY,
-        alignment=1,
-        spaceAfter=20
-    )
-
-    section_title = ParagraphStyle(
-        name="SectionTitle",
-        fontName="Helvetica-Bold",
-        fontSize=14,
-        textColor=PRIMARY,
-        spaceAfter=10
-    )
-
-    story = []
-    story.append(Paragraph("Prestige Planners – Payment Receipt", title_style))
-    story.append(Spacer(1, 10))
-
-    invoice_info_data = [
-        ["Receipt No.:", f"#{booking.id}"],
-        ["Generated On:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-        ["Payment Ref:", booking.payment_reference]
-    ]
-
-    invoice_table = Table(invoice_info_data, colWidths=[120, 350])
-    invoice_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), LIGHTGREY),
-        ('TEXTCOLOR', (0, 0), (-1, -1), DARKGREY),
-        ('BOX', (0, 0), (-1, -1), 1, colors.grey),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-    ]))
-
-    story.append(invoice_table)
-    story.append(Spacer(1, 20))
-
-    story.append(Paragraph("Customer Details", section_title))
-    customer_data = [
-        ["Name:", booking.user.name],
-        ["Email:", booking.user.email],
-    ]
-    cust_table = Table(customer_data, colWidths=[120, 350])
-    cust_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 0), (-1, -1), DARKGREY),
-        ('BOX', (0, 0), (-1, -1), 1, colors.grey),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-    ]))
-
-    story.append(cust_table)
-    story.append(Spacer(1, 20))
-
-    story.append(Paragraph("Event Details", section_title))
-    event_data = [
-        ["Event Name:", booking.event.name],
-        ["Venue:", booking.venue],
-        ["Selected Date:", booking.date],
-    ]
-    event_table = Table(event_data, colWidths=[120, 350])
-    event_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 0), (-1, -1), DARKGREY),
-        ('BOX', (0, 0), (-1, -1), 1, colors.grey),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-    ]))
-
-    story.append(event_table)
-    story.append(Spacer(1, 25))
-
-    story.append(Paragraph("Payment Summary", section_title))
-    price_data = [
-        ["Description", "Amount (Rs.)"],
-        [
-            Paragraph(f"{booking.event.name} Booking Fee", normal),
-            Paragraph(f"{booking.event.price:.2f}", normal)
-        ]
-    ]
-    price_table = Table(price_data, colWidths=[350, 120])
-    price_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), PRIMARY),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (-1, 0), "Helvetica-Bold"),
-        ('BACKGROUND', (0, 1), (-1, -1), LIGHTGREY),
-        ('TEXTCOLOR', (0, 1), (-1, -1), DARKGREY),
-        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-        ('BOX', (0, 0), (-1, -1), 1, colors.grey),
-        ('INNERGRID', (0, 0), (-1, -1), 0.25, colors.grey),
-        ('NOSPLIT', (0, 0), (-1, -1)),
-    ]))
-
-    story.append(price_table)
-    story.append(Spacer(1, 35))
-
-    thank_style = ParagraphStyle(
-        name="Thanks",
-        fontName="Helvetica-Oblique",
-        fontSize=12,
-        textColor=PRIMARY,
-        alignment=1,
-    )
-    story.append(Paragraph("Thank you for choosing Prestige Planners!", thank_style))
-
-    doc.build(story)
-
-    buffer.seek(0)
+    from receipts import build_receipt  # loads ReportLab on first use
+    buffer = build_receipt(booking)
     return send_file(
         buffer,
         as_attachment=True,
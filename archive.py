@@ -0,0 +1,117 @@
+"""
+Hot/cold archival of past bookings.
+
+archive_bookings() moves bookings whose date is more than ARCHIVE_RETENTION_DAYS
+in the past from Booking to BookingArchive, in batches: one INSERT ... SELECT
+and one DELETE per batch, committed together, so a row is always in exactly
+one table and the job can be interrupted and re-run at any point. Occupancy
+rows for those days are pruned too. Run it from cron
+(`flask archive-bookings`) to keep the hot table bounded to roughly the
+retention window plus future bookings.
+
+Dashboards, exports, availability and the admin queue only read the hot table.
+Receipts, the profile history and per-user booking counts (admin user list,
+user exports) read both through the helpers below, the
+user dashboard through projections.archived_booking_rows(), and
+rollups.rebuild() aggregates both, so revenue figures are unaffected by
+archival. Archived rows keep a snapshot of their event's name, category and
+price, so all of that still works after the event is deleted.
+"""
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, insert, delete, text, union_all
+from models import db, Booking, BookingArchive, Event, VenueOccupancy
+
+DEFAULT_RETENTION_DAYS = 90
+BATCH = 1000
+
+COLUMNS = [c.name for c in Booking.__table__.columns]
+
+
+def archive_bookings(retention_days=DEFAULT_RETENTION_DAYS, batch=BATCH, dry_run=False):
+    """Move bookings dated before today - retention_days to the archive. Returns the count moved (or due, with dry_run)."""
+    cutoff = date.today() - timedelta(days=retention_days)
+    due = Booking.query.filter(Booking.date < cutoff)
+    if dry_run:
+        return due.count()
+    _check_ids_monotonic()
+
+    booking = Booking.__table__
+    event = Event.__table__
+    archive = BookingArchive.__table__
+    snapshot_events()
+    moved = 0
+    while True:
+        ids = [i for (i,) in due.with_entities(Booking.id).order_by(Booking.id).limit(batch)]
+        if not ids:
+            break
+        now = datetime.utcnow()
+        rows = (select(*[booking.c[name] for name in COLUMNS], db.literal(now),
+                       event.c.name, event.c.category, event.c.price)
+                .select_from(booking.outerjoin(event, event.c.id == booking.c.event_id))
+                .where(booking.c.id.in_(ids)))
+        db.session.execute(insert(archive).from_select(
+            COLUMNS + ["archived_at", "event_name", "event_category", "event_price"], rows))
+        db.session.execute(delete(booking).where(booking.c.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+
+    # nobody can book these days any more, so their slots no longer need holding
+    VenueOccupancy.query.filter(VenueOccupancy.date < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return moved
+
+
+def snapshot_events():
+    """Fill the event snapshot on rows archived before it existed, while their events are still there."""
+    event = db.session.query(Event).filter(Event.id == BookingArchive.event_id)
+    (BookingArchive.query
+     .filter(BookingArchive.event_name.is_(None), event.exists())
+     .update({
+         BookingArchive.event_name: event.with_entities(Event.name).scalar_subquery(),
+         BookingArchive.event_category: event.with_entities(Event.category).scalar_subquery(),
+         BookingArchive.event_price: event.with_entities(Event.price).scalar_subquery(),
+     }, synchronize_session=False))
+    db.session.commit()
+
+
+def _check_ids_monotonic():
+    # archived rows keep their ids, so SQLite must not hand them out again
+    if db.engine.dialect.name != "sqlite":
+        return
+    sql = db.session.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'booking'")).scalar()
+    if sql and "AUTOINCREMENT" not in sql.upper():
+        raise RuntimeError("booking ids can be reused on this database; run `flask upgrade-db` before archiving")
+
+
+def get_booking(booking_id):
+    """A booking by id from the hot table or the archive, or None."""
+    return db.session.get(Booking, booking_id) or db.session.get(BookingArchive, booking_id)
+
+
+def user_booking_counts(user_id):
+    """(total, paid) bookings for a user across both tables."""
+    total = paid = 0
+    for model in (Booking, BookingArchive):
+        t, p = (db.session.query(db.func.count(model.id),
+                                 db.func.coalesce(db.func.sum(db.case((model.paid == True, 1), else_=0)), 0))
+                .filter(model.user_id == user_id).one())
+        total += t
+        paid += int(p)
+    return total, paid
+
+
+def booking_counts_by_user():
+    """Subquery of (user_id, n): bookings per user across both tables, for outer joins on User.id."""
+    both = union_all(select(Booking.user_id), select(BookingArchive.user_id)).subquery()
+    return (select(both.c.user_id, db.func.count().label("n"))
+            .group_by(both.c.user_id).subquery())
+
+
+def recent_user_bookings(user_id, limit=10):
+    """A user's latest bookings by created_at, merged from both tables."""
+    rows = []
+    for model in (Booking, BookingArchive):
+        rows += (model.query.filter_by(user_id=user_id)
+                 .order_by(model.created_at.desc()).limit(limit).all())
+    rows.sort(key=lambda b: b.created_at or datetime.min, reverse=True)
+    return rows[:limit]
@@ -0,0 +1,108 @@
+"""
+Content-hashed, precompressed static files.
+
+`flask build-assets` copies every file under static/ to static/dist/ with a
+hash of its content in the name (css/style.css -> css/style.1a2b3c4d5e.css),
+writes .gz and, if the brotli package is installed, .br variants next to
+text files, and records the mapping in static/dist/manifest.json.
+
+When the manifest exists, url_for('static', filename='css/style.css')
+returns the hashed URL, and hashed files are served with
+"Cache-Control: public, max-age=31536000, immutable": changed content gets a
+new name, so browsers never revalidate. The precompressed variant matching
+Accept-Encoding is sent as it is, so static files cost no compression per
+request. Anything not in the manifest is served as before.
+
+The manifest is read at startup: rebuild and restart after editing static
+files (or delete static/dist). Earlier builds are kept so pages rendered
+before a deploy can still load their assets.
+"""
+import os, json, gzip, hashlib, mimetypes
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+import compression
+
+DIST = "dist"
+HASH_LEN = 10
+MAX_AGE = 365 * 24 * 3600
+PRECOMPRESS = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map", ".xml"}
+MIN_PRECOMPRESS = 256
+
+_state = {"manifest": {}}
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def build(static_folder):
+    """Write hashed copies and compressed variants into static/dist/; returns the manifest."""
+    out = os.path.join(static_folder, DIST)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder):
+            dirs[:] = [d for d in dirs if d != DIST]
+        for name in sorted(files):
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, static_folder).replace(os.sep, "/")
+            with open(src, "rb") as f:
+                data = f.read()
+            stem, ext = os.path.splitext(rel)
+            hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LEN]}{ext}"
+            dest = os.path.join(out, hashed)
+            _write(dest, data)
+            if ext.lower() in PRECOMPRESS and len(data) >= MIN_PRECOMPRESS:
+                variants = {".gz": gzip.compress(data, 9, mtime=0)}
+                if compression.brotli is not None:
+                    variants[".br"] = compression.brotli.compress(data, quality=11)
+                for suffix, packed in variants.items():
+                    if len(packed) < len(data):
+                        _write(dest + suffix, packed)
+            manifest[rel] = f"{DIST}/{hashed}"
+    _write(os.path.join(out, "manifest.json"), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def load_manifest(path):
+    if not path or not os.path.isfile(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def hashed_url_defaults(endpoint, values):
+    if endpoint == "static":
+        hashed = _state["manifest"].get(values.get("filename"))
+        if hashed:
+            values["filename"] = hashed
+
+
+def send_static(filename):
+    """Static view: hashed files get immutable caching and precompressed variants."""
+    app = current_app
+    if not filename.startswith(DIST + "/"):
+        return app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        path = safe_join(app.static_folder, filename + suffix)
+        if request.accept_encodings[encoding] and path and os.path.isfile(path):
+            resp = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype, max_age=MAX_AGE)
+            resp.headers["Content-Encoding"] = encoding
+            break
+    else:
+        resp = send_from_directory(app.static_folder, filename, mimetype=mimetype, max_age=MAX_AGE)
+    resp.headers["Cache-Control"] = f"public, max-age={MAX_AGE}, immutable"
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
+def init_app(app):
+    """Use the static/dist manifest (ASSET_MANIFEST) for static URLs, if one has been built."""
+    app.config.setdefault("ASSET_MANIFEST", os.getenv(
+        "ASSET_MANIFEST", os.path.join(app.static_folder, DIST, "manifest.json")))
+    _state["manifest"] = load_manifest(app.config["ASSET_MANIFEST"])
+    app.url_defaults(hashed_url_defaults)
+    app.view_functions["static"] = send_static
@@ -0,0 +1,181 @@
+"""
+Month-view availability for /api/availability.
+
+For each month that is asked for, every (event, venue) pair gets:
+
+    open     int bitmap, bit d-1 set when the event offers that venue on day d
+    counts   array of live (non-rejected) bookings per day
+
+plus, per physical venue, the days held by some event (see occupancy.py) so
+days taken by a *different* event are reported as blocked. Bitmaps are plain
+Python ints, which keeps a month of a few thousand events in well under a
+megabyte without pulling in NumPy.
+
+Months are built on first request from Event.available_dates, one grouped
+booking count and the occupancy rows, then kept in process memory: the
+AVAILABILITY_MAX_MONTHS most recently used (default 24), and only months
+within in_window() of today, so stepping through arbitrary months cannot grow
+the cache or force a scan per request.
+record_booking() updates a cached month in place when a booking is created or
+rejected; invalidate() drops everything after admin event changes. Entries
+also expire after AVAILABILITY_TTL seconds so other workers' bookings show up.
+"""
+import json, time, threading, calendar
+from array import array
+from collections import OrderedDict
+from datetime import date
+from models import db, Event, Booking, VenueOccupancy
+from occupancy import venue_key
+
+_lock = threading.Lock()
+_months = OrderedDict()  # (year, month) -> MonthAvailability, least recently used first
+_settings = {"ttl": 60, "max_months": 24}
+PAST_MONTHS = 12
+FUTURE_MONTHS = 36
+
+
+class MonthAvailability:
+    def __init__(self, year, month):
+        self.year = year
+        self.month = month
+        self.ndays = calendar.monthrange(year, month)[1]
+        self.first = date(year, month, 1)
+        self.last = date(year, month, self.ndays)
+        self.built_at = time.monotonic()
+        self.events = {}  # event_id -> name
+        self.open = {}    # (event_id, venue) -> bitmap
+        self.counts = {}  # (event_id, venue) -> array('H') per day
+        self.held = {}    # venue_key -> {day: event_id}
+        self._payload = None
+
+    def build(self):
+        rows = db.session.query(Event.id, Event.name, Event.available_dates).all()
+        prefix = f"{self.year:04d}-{self.month:02d}-"
+        for event_id, name, raw in rows:
+            try:
+                av = json.loads(raw or "{}")
+            except ValueError:
+                continue
+            if not isinstance(av, dict):
+                continue
+            for venue, dates in av.items():
+                bits = 0
+                for d in dates if isinstance(dates, list) else []:
+                    d = str(d)
+                    if not d.startswith(prefix):
+                        continue
+                    # fromisoformat rejects days the month doesn't have (2026-02-29)
+                    try:
+                        day = date.fromisoformat(d)
+                    except ValueError:
+                        continue
+                    bits |= 1 << (day.day - 1)
+                if bits:
+                    self.events[event_id] = name
+                    self.open[(event_id, venue)] = bits
+
+        booked = (
+            db.session.query(Booking.event_id, Booking.venue, Booking.date, db.func.count(Booking.id))
+            .filter(Booking.date >= self.first, Booking.date <= self.last, Booking.status != 'Rejected')
+            .group_by(Booking.event_id, Booking.venue, Booking.date)
+        )
+        for event_id, venue, day, n in booked:
+            self._counts_for(event_id, venue)[day.day - 1] = n
+
+        held = VenueOccupancy.query.filter(VenueOccupancy.date >= self.first, VenueOccupancy.date <= self.last)
+        for row in held:
+            self.held.setdefault(row.venue_key, {})[row.date.day] = row.event_id
+        return self
+
+    def _counts_for(self, event_id, venue):
+        c = self.counts.get((event_id, venue))
+        if c is None:
+            c = self.counts[(event_id, venue)] = array('H', bytes(2 * self.ndays))
+        return c
+
+    def apply(self, event_id, venue, day, delta):
+        c = self._counts_for(event_id, venue)
+        c[day - 1] = max(0, c[day - 1] + delta)
+        days_held = self.held.setdefault(venue_key(venue), {})
+        if delta > 0:
+            days_held.setdefault(day, event_id)
+        elif c[day - 1] == 0 and days_held.get(day) == event_id:
+            del days_held[day]
+        self._payload = None
+
+    def payload(self):
+        """The /api/availability response body as JSON text; cached until the month changes."""
+        if self._payload is not None:
+            return self._payload
+        events = {}
+        for (event_id, venue), bits in self.open.items():
+            counts = self.counts.get((event_id, venue))
+            held = self.held.get(venue_key(venue), {})
+            open_days, blocked, booked = [], [], {}
+            d = 1
+            while bits:
+                if bits & 1:
+                    holder = held.get(d)
+                    if holder is not None and holder != event_id:
+                        blocked.append(d)
+                    else:
+                        open_days.append(d)
+                        if counts is not None and counts[d - 1]:
+                            booked[str(d)] = counts[d - 1]
+                bits >>= 1
+                d += 1
+            ev = events.setdefault(event_id, {"id": event_id, "name": self.events[event_id], "venues": {}})
+            ev["venues"][venue] = {"open": open_days, "booked": booked, "blocked": blocked}
+        self._payload = json.dumps({
+            "month": f"{self.year:04d}-{self.month:02d}",
+            "days": self.ndays,
+            "events": sorted(events.values(), key=lambda e: e["id"]),
+        }, separators=(",", ":"))
+        return self._payload
+
+
+def configure(ttl, max_months=24):
+    _settings["ttl"] = ttl
+    _settings["max_months"] = max_months
+
+
+def in_window(year, month, today=None):
+    """True for months from PAST_MONTHS before today's month to FUTURE_MONTHS after it."""
+    today = today or date.today()
+    offset = (year - today.year) * 12 + (month - today.month)
+    return -PAST_MONTHS <= offset <= FUTURE_MONTHS
+
+
+def get_month(year, month):
+    key = (year, month)
+    with _lock:
+        m = _months.get(key)
+        if m is not None and time.monotonic() - m.built_at < _settings["ttl"]:
+            _months.move_to_end(key)
+            return m
+    m = MonthAvailability(year, month).build()
+    with _lock:
+        _months[key] = m
+        _months.move_to_end(key)
+        while len(_months) > _settings["max_months"]:
+            _months.popitem(last=False)
+    return m
+
+
+def month_payload(year, month):
+    m = get_month(year, month)
+    with _lock:
+        return m.payload()
+
+
+def record_booking(event_id, venue, day, delta=1):
+    """Apply a booking (+1) or rejection (-1) to the cached month, if any."""
+    with _lock:
+        m = _months.get((day.year, day.month))
+        if m is not None:
+            m.apply(event_id, venue, day.day, delta)
+
+
+def invalidate():
+    with _lock:
+        _months.clear()
@@ -0,0 +1,38 @@
+"""
+Compare two loadtest result files route by route.
+
+    python bench/compare.py bench/results/before.json bench/results/after.json
+"""
+import sys, json
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def delta(old, new):
+    if not old:
+        return "    n/a"
+    return f"{(new - old) / old * 100:+7.1f}%"
+
+
+def compare(base, head, metrics=("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "ttfb_p95_ms", "bytes_mean")):
+    print(f"base: {base.get('commit')}  head: {head.get('commit')}")
+    print(f"{'route':32} " + " ".join(f"{m:>24}" for m in metrics))
+    for route in sorted(set(base["routes"]) | set(head["routes"])):
+        a = base["routes"].get(route, {})
+        b = head["routes"].get(route, {})
+        cells = []
+        for m in metrics:
+            if m in a and m in b:
+                cells.append(f"{a[m]:>8.1f} -> {b[m]:>7.1f} {delta(a[m], b[m])}")
+            else:
+                cells.append(f"{'-':>24}")
+        print(f"{route:32} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: compare.py BASE.json HEAD.json")
+    compare(load(sys.argv[1]), load(sys.argv[2]))
@@ -0,0 +1,213 @@
+"""
+Synthetic data generator for load testing.
+
+Bulk-inserts users, events and bookings straight through the SQLAlchemy core
+(executemany in batches) so millions of rows can be created in minutes.
+
+    python bench/datagen.py --users 100000 --events 2000 --bookings 1000000
+
+All synthetic users share the password given by --password (default
+"loadtest") and have emails like user42@load.test, which is what
+bench/loadtest.py logs in with.
+
+As in production, a venue/date slot goes to one event only: a booking that
+picks a slot some other event already holds is given to that event instead.
+Paid bookings carry the amount charged (the event's price). The venue
+occupancy index and the analytics rollups are rebuilt from the generated
+bookings at the end.
+"""
+import os, sys, json, random, argparse, time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = [
+    "Business and Corporate", "Workshops", "Entertainment", "Technology",
+    "Food & Beverages", "Health & Wellness", "Education", "Fundraiser",
+    "Sports", "Birthday",
+]
+
+# shared pool so several events compete for the same physical venues,
+# just like the seeded data ("Auditorium 2", "VIP Lounge", ...)
+VENUES = [
+    "Conference Hall A", "Auditorium 1", "Auditorium 2", "Auditorium 3",
+    "Seminar Room 5", "VIP Lounge", "Sky Deck", "Open Arena", "Grand Stage",
+    "Rooftop Hall", "Expo Hall A", "Expo Hall B", "Tech Arena", "Main Hall",
+    "Courtyard", "Library", "Garden Area", "Studio 1", "Studio 2",
+    "Banquet Hall A", "Club Lounge", "Poolside", "Black Box Theater",
+    "Innovation Hub", "Networking Hall", "Runway Hall", "City Track",
+    "Kitchen Lab 1", "Wellness Hall", "Media Hall",
+]
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Bulk-insert synthetic users, events and bookings.")
+    p.add_argument("--users", type=int, default=10000)
+    p.add_argument("--events", type=int, default=500)
+    p.add_argument("--bookings", type=int, default=100000)
+    p.add_argument("--batch", type=int, default=10000, help="rows per executemany batch")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--password", default="loadtest", help="password shared by all synthetic users")
+    p.add_argument("--start", default=None, help="first event day (YYYY-MM-DD), default today - 180 days")
+    p.add_argument("--span-days", type=int, default=540, help="window event dates are spread over")
+    return p.parse_args(argv)
+
+
+def random_available_dates(rng, start, span_days):
+    """Build an available_dates mapping shaped like the seeded events."""
+    venues = rng.sample(VENUES, rng.randint(3, 6))
+    first = start + timedelta(days=rng.randrange(span_days))
+    step = rng.choice([1, 3, 5, 7])
+    out = {}
+    for i, v in enumerate(venues):
+        n = rng.randint(4, 8)
+        base = first + timedelta(days=i)
+        out[v] = [(base + timedelta(days=step * k)).isoformat() for k in range(n)]
+    return out
+
+
+def batched(rows_iter, size):
+    batch = []
+    for row in rows_iter:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert_batches(db, table, rows_iter, batch_size, label):
+    t0 = time.perf_counter()
+    total = 0
+    for batch in batched(rows_iter, batch_size):
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        total += len(batch)
+        print(f"\r{label}: {total:,} rows", end="", flush=True)
+    dt = time.perf_counter() - t0
+    rate = total / dt if dt else 0
+    print(f"\r{label}: {total:,} rows in {dt:.1f}s ({rate:,.0f} rows/s)")
+    return total
+
+
+def generate(args):
+    from app import app, bcrypt
+    from models import db, User, Event, Booking
+    import occupancy, rollups
+
+    rng = random.Random(args.seed)
+    start = date.fromisoformat(args.start) if args.start else date.today() - timedelta(days=180)
+
+    with app.app_context():
+        db.create_all()
+
+        first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+        first_event = (db.session.query(db.func.max(Event.id)).scalar() or 0) + 1
+
+        # one hash for everybody: hashing a million passwords would dominate the run
+        pw_hash = bcrypt.generate_password_hash(args.password).decode("utf-8")
+        now = datetime.utcnow()
+
+        def users():
+            for i in range(first_user, first_user + args.users):
+                created = now - timedelta(seconds=rng.randrange(365 * 86400))
+                yield {
+                    "id": i,
+                    "name": f"Load User {i}",
+                    "email": f"user{i}@load.test",
+                    "password": pw_hash,
+                    "is_admin": False,
+                    "created_at": created,
+                    "last_login": created + timedelta(seconds=rng.randrange(86400)) if rng.random() < 0.7 else None,
+                }
+
+        insert_batches(db, User.__table__, users(), args.batch, "users")
+
+        event_dates = {}
+        event_prices = {}
+
+        def events():
+            for i in range(first_event, first_event + args.events):
+                av = random_available_dates(rng, start, args.span_days)
+                event_dates[i] = [(v, d) for v, ds in av.items() for d in ds]
+                event_prices[i] = float(rng.choice([1000, 2500, 4000, 7500, 12000, 20000, 45000]))
+                yield {
+                    "id": i,
+                    "name": f"Synthetic Event {i}",
+                    "category": rng.choice(CATEGORIES),
+                    "price": event_prices[i],
+                    "available_days": ", ".join(rng.sample(DAYS, rng.randint(1, 4))),
+                    "available_venues": ", ".join(av.keys()),
+                    "available_dates": json.dumps(av),
+                    "created_at": now,
+                }
+
+        insert_batches(db, Event.__table__, events(), args.batch, "events")
+
+        user_ids = (first_user, first_user + args.users - 1)
+        event_ids = list(event_dates.keys())
+        if not event_ids or args.users <= 0:
+            print("bookings: skipped (need at least one synthetic user and event)")
+            return
+
+        # (venue_key, date) -> event holding it; events list overlapping slots,
+        # so without this several events would be booked into the same one
+        holders = {}
+        for eid, slots in event_dates.items():
+            for venue, d in slots:
+                holders.setdefault((occupancy.venue_key(venue), d), eid)
+
+        def bookings():
+            for _ in range(args.bookings):
+                eid = rng.choice(event_ids)
+                venue, d = rng.choice(event_dates[eid])
+                eid = holders[(occupancy.venue_key(venue), d)]
+                d = date.fromisoformat(d)
+                roll = rng.random()
+                if roll < 0.25:
+                    status, paid = "Pending", False
+                elif roll < 0.45:
+                    status, paid = "Pending", True
+                elif roll < 0.90:
+                    status, paid = "Approved", True
+                else:
+                    status, paid = "Rejected", False
+                created = now - timedelta(seconds=rng.randrange(180 * 86400))
+                row = {
+                    "user_id": rng.randint(*user_ids),
+                    "event_id": eid,
+                    "date": d,
+                    "venue": venue,
+                    "day": d.strftime("%A"),
+                    "created_at": created,
+                    "status": status,
+                    "paid": paid,
+                    "payment_reference": None,
+                    "rejection_reason": "Synthetic rejection" if status == "Rejected" else None,
+                    "amount": None,
+                    "paid_at": None,
+                    "decided_at": None,
+                }
+                if paid:
+                    row["payment_reference"] = f"FAKE-{rng.choice(['CARD', 'UPI', 'NETBANKING'])}-LOAD"
+                    row["amount"] = event_prices[eid]
+                    row["paid_at"] = created + timedelta(seconds=rng.randrange(3600))
+                if status != "Pending":
+                    row["decided_at"] = created + timedelta(seconds=rng.randrange(3600, 3 * 86400))
+                yield row
+
+        insert_batches(db, Booking.__table__, bookings(), args.batch, "bookings")
+
+        t0 = time.perf_counter()
+        collisions = occupancy.find_collisions(rebuild=True)
+        print(f"venue occupancy: rebuilt in {time.perf_counter() - t0:.1f}s, {len(collisions)} collision(s)")
+        t0 = time.perf_counter()
+        n = rollups.rebuild()
+        print(f"rollups: {n:,} rows rebuilt in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    generate(parse_args())
@@ -0,0 +1,81 @@
+"""
+Measure cold-start import cost of the app with `python -X importtime`.
+
+    python bench/importtime.py              # import app, 5 runs
+    python bench/importtime.py --module receipts --runs 10
+
+Reports the median cumulative import time of the module, the share spent in
+each package it imports directly (flask, models, reportlab, ...) and writes JSON to
+bench/results/ for comparison across commits.
+"""
+import os, sys, json, argparse, statistics, subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+
+def measure(module):
+    """One fresh interpreter; returns {package: cumulative_us} for direct imports."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    totals = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            cumulative = int(cumulative)
+        except ValueError:
+            continue  # header line
+        name = name.rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        pkg = name.strip().split(".")[0]
+        # depth 0 is interpreter startup plus the module itself, depth 1 its direct imports
+        if depth <= 1 or name.strip() == module:
+            totals.setdefault(pkg, 0)
+            totals[pkg] += cumulative
+    return totals
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--module", default="app")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--top", type=int, default=10)
+    p.add_argument("--output", default=None)
+    args = p.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    pkgs = set().union(*runs)
+    median = {pkg: statistics.median(r.get(pkg, 0) for r in runs) for pkg in pkgs}
+    total_ms = median.get(args.module, 0) / 1000
+
+    print(f"import {args.module}: {total_ms:.1f} ms (median of {args.runs})")
+    for pkg, us in sorted(median.items(), key=lambda kv: -kv[1])[: args.top + 1]:
+        if pkg != args.module:
+            print(f"  {pkg:24} {us / 1000:8.1f} ms")
+    print(f"  reportlab loaded at import: {'yes' if median.get('reportlab') else 'no'}")
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    result = {
+        "commit": commit,
+        "timestamp": datetime.utcnow().isoformat(),
+        "module": args.module,
+        "runs": args.runs,
+        "total_ms": round(total_ms, 2),
+        "packages_ms": {k: round(v / 1000, 2) for k, v in sorted(median.items(), key=lambda kv: -kv[1])},
+    }
+    out = args.output or os.path.join(BENCH_DIR, "results", f"importtime-{args.module}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
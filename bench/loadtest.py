@@ -0,0 +1,410 @@
+"""
+Scripted load harness that drives the real Flask routes.
+
+Each virtual user walks the booking funnel (login -> browse -> event detail ->
+book -> dashboard -> pay) in a loop while admin workers approve the paid
+bookings. Latency is recorded per route and summarised as p50/p95/p99 plus
+throughput, then written as JSON so runs can be compared across commits
+(see bench/compare.py).
+
+    # in-process, against the configured database
+    python bench/loadtest.py --concurrency 16 --duration 60
+
+    # over HTTP against a running server (gunicorn, flask run, ...)
+    python bench/loadtest.py --url http://127.0.0.1:5000 --concurrency 64
+
+Users are expected to come from bench/datagen.py (user<N>@load.test).
+
+The login-flood scenario adds workers hammering POST /login with bad
+passwords and checks that the booking routes stay within --slo-ms at p95:
+
+    python bench/loadtest.py --scenario login-flood --flood-workers 32
+
+Each virtual user gets its own client address (REMOTE_ADDR in-process,
+X-Forwarded-For over HTTP; start the server with RATELIMIT_TRUST_PROXY=1) so
+per-client rate limits apply to the flood and not to everybody.
+
+Alongside latency each route reports time to first byte and bytes on the
+wire (the body as sent, compressed or not). Clients send --accept-encoding
+(default "br, gzip", or "gzip" without the brotli package); compare against a run with --accept-encoding "" to see
+what compression saves. Each virtual user also fetches the page's stylesheet
+and script once, as a browser with a warm cache would.
+"""
+import os, sys, re, json, gzip, math, time, random, argparse, threading, subprocess, queue
+from datetime import datetime
+from http.cookiejar import CookieJar
+from urllib import request as urlrequest, parse as urlparse, error as urlerror
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+PAY_LINK = re.compile(r'/pay/(\d+)')
+EVENT_LINK = re.compile(r'/events/(\d+)')
+STATIC_LINK = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+# the booking path: routes whose p95 is checked against --slo-ms
+SLO_ROUTES = ("GET /", "GET /events/<id>", "GET /book/<id>", "POST /book/<id>",
+              "GET /user/dashboard", "GET /pay/<id>", "POST /payment_complete")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Drive the booking funnel and report per-route latency.")
+    p.add_argument("--url", default=None, help="base URL of a running server; in-process test client if omitted")
+    p.add_argument("--concurrency", type=int, default=8, help="virtual users walking the booking funnel")
+    p.add_argument("--admin-workers", type=int, default=1, help="workers approving paid bookings")
+    p.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    p.add_argument("--think-time", type=float, default=0.0, help="seconds to sleep between steps")
+    p.add_argument("--user-range", default="1-1000", help="synthetic user ids to log in as, e.g. 2-5000")
+    p.add_argument("--password", default="loadtest")
+    p.add_argument("--admin-email", default="admin@events.local")
+    p.add_argument("--admin-password", default="admin123")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--scenario", choices=["funnel", "login-flood"], default="funnel")
+    p.add_argument("--flood-workers", type=int, default=16, help="login-flood: threads posting bad logins")
+    p.add_argument("--flood-ips", type=int, default=1, help="login-flood: distinct client addresses the flood uses")
+    p.add_argument("--flood-delay", type=float, default=1.0, help="login-flood: seconds before the flood starts")
+    p.add_argument("--slo-ms", type=float, default=500.0, help="p95 latency objective for the booking routes")
+    p.add_argument("--accept-encoding", default="br, gzip" if brotli else "gzip",
+                   help='Accept-Encoding sent by clients ("" for none)')
+    p.add_argument("--output", default=None, help="JSON result path (default bench/results/<time>-<commit>.json)")
+    return p.parse_args(argv)
+
+
+# ------------------ CLIENTS ------------------
+
+class _NoRedirect(urlrequest.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def decode_body(raw, encoding):
+    if encoding == "gzip":
+        return gzip.decompress(raw)
+    if encoding == "br":
+        return brotli.decompress(raw)
+    return raw
+
+
+class Reply:
+    """A response: status, decoded body, bytes received and seconds to the first byte."""
+    __slots__ = ("status", "body", "wire_bytes", "ttfb")
+
+    def __init__(self, status, body, wire_bytes, ttfb):
+        self.status = status
+        self.body = body
+        self.wire_bytes = wire_bytes
+        self.ttfb = ttfb
+
+
+class HttpClient:
+    """One browser session against a live server (own cookie jar, no redirects)."""
+
+    def __init__(self, base_url, client_ip=None, accept_encoding=""):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"X-Forwarded-For": client_ip} if client_ip else {}
+        if accept_encoding:
+            self.headers["Accept-Encoding"] = accept_encoding
+        self.opener = urlrequest.build_opener(
+            urlrequest.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        body = urlparse.urlencode(data).encode() if data is not None else None
+        req = urlrequest.Request(self.base_url + path, data=body, method=method, headers=self.headers)
+        t0 = time.perf_counter()
+        try:
+            resp = self.opener.open(req, timeout=60)
+        except urlerror.HTTPError as e:
+            resp = e
+        # urlopen returns once the status line and headers are in
+        ttfb = time.perf_counter() - t0
+        with resp:
+            raw = resp.read()
+            return Reply(resp.status, decode_body(raw, resp.headers.get("Content-Encoding")), len(raw), ttfb)
+
+
+class InProcessClient:
+    """One browser session using Flask's test client."""
+
+    def __init__(self, app, client_ip=None, accept_encoding=""):
+        self.client = app.test_client()
+        if client_ip:
+            self.client.environ_base["REMOTE_ADDR"] = client_ip
+        if accept_encoding:
+            self.client.environ_base["HTTP_ACCEPT_ENCODING"] = accept_encoding
+
+    def request(self, method, path, data=None):
+        t0 = time.perf_counter()
+        resp = self.client.open(path, method=method, data=data, buffered=False)
+        chunks = iter(resp.response)
+        first = next(chunks, b"")
+        ttfb = time.perf_counter() - t0
+        raw = first + b"".join(chunks)
+        resp.close()
+        return Reply(resp.status_code, decode_body(raw, resp.headers.get("Content-Encoding")), len(raw), ttfb)
+
+
+# ------------------ RECORDING ------------------
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.statuses = {}
+        self.ttfb = {}
+        self.wire_bytes = {}
+
+    def record(self, route, seconds, ok, status=None, reply=None):
+        with self.lock:
+            self.samples.setdefault(route, []).append(seconds)
+            if reply is not None:
+                self.ttfb.setdefault(route, []).append(reply.ttfb)
+                self.wire_bytes[route] = self.wire_bytes.get(route, 0) + reply.wire_bytes
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+            if status is not None:
+                counts = self.statuses.setdefault(route, {})
+                counts[status] = counts.get(status, 0) + 1
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    for route, values in sorted(recorder.samples.items()):
+        values = sorted(values)
+        ttfb = sorted(recorder.ttfb.get(route, []))
+        wire = recorder.wire_bytes.get(route, 0)
+        routes[route] = {
+            "count": len(values),
+            "errors": recorder.errors.get(route, 0),
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(values) / len(values) * 1000, 3),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3),
+            "ttfb_p50_ms": round(percentile(ttfb, 50) * 1000, 3),
+            "ttfb_p95_ms": round(percentile(ttfb, 95) * 1000, 3),
+            "bytes_mean": round(wire / len(ttfb)) if ttfb else 0,
+            "bytes_total": wire,
+            "statuses": {str(k): v for k, v in sorted(recorder.statuses.get(route, {}).items())},
+        }
+    return routes
+
+
+def check_slo(routes, slo_ms):
+    checked = {r: {"p95_ms": routes[r]["p95_ms"], "ok": routes[r]["p95_ms"] <= slo_ms}
+               for r in SLO_ROUTES if r in routes}
+    return {"p95_ms_limit": slo_ms, "routes": checked, "ok": all(v["ok"] for v in checked.values())}
+
+
+# ------------------ SCENARIO ------------------
+
+def timed(client, recorder, route, method, path, data=None):
+    t0 = time.perf_counter()
+    try:
+        reply = client.request(method, path, data)
+    except Exception:
+        recorder.record(route, time.perf_counter() - t0, False)
+        return 0, b""
+    recorder.record(route, time.perf_counter() - t0, reply.status < 400, reply.status, reply)
+    return reply.status, reply.body
+
+
+def virtual_ip(n):
+    return f"10.{n // 62500 % 250}.{n // 250 % 250}.{n % 250 + 1}"
+
+
+def pick_slot(rng, event_html):
+    """Choose a venue/date from the EVENT_AVAILABLE_DATES blob on the booking page."""
+    m = re.search(rb"window\.EVENT_AVAILABLE_DATES = (.*?);</script>", event_html)
+    if not m:
+        return None
+    try:
+        av = json.loads(m.group(1))
+    except ValueError:
+        return None
+    venues = [v for v, ds in av.items() if ds]
+    if not venues:
+        return None
+    venue = rng.choice(venues)
+    return venue, rng.choice(av[venue])
+
+
+def user_loop(make_client, recorder, args, stop, paid_q, seed):
+    rng = random.Random(seed)
+    lo, hi = (int(x) for x in args.user_range.split("-"))
+    client = make_client(virtual_ip(seed))
+    uid = rng.randint(lo, hi)
+    status, _ = timed(client, recorder, "POST /login", "POST", "/login",
+                      {"email": f"user{uid}@load.test", "password": args.password})
+    if status >= 400:
+        return
+    event_ids = []
+    fetched = set()
+    while not stop.is_set():
+        _, body = timed(client, recorder, "GET /", "GET", "/")
+        html = body.decode("utf-8", "ignore")
+        event_ids = [int(x) for x in EVENT_LINK.findall(html)] or event_ids
+        for path in STATIC_LINK.findall(html):
+            if path not in fetched:
+                # cached by the browser afterwards (immutable once hashed)
+                fetched.add(path)
+                timed(client, recorder, "GET /static/<file>", "GET", path)
+        if not event_ids:
+            return
+        eid = rng.choice(event_ids)
+        time.sleep(args.think_time)
+        timed(client, recorder, "GET /events/<id>", "GET", f"/events/{eid}")
+        _, body = timed(client, recorder, "GET /book/<id>", "GET", f"/book/{eid}")
+        slot = pick_slot(rng, body)
+        if slot:
+            time.sleep(args.think_time)
+            timed(client, recorder, "POST /book/<id>", "POST", f"/book/{eid}",
+                  {"venue": slot[0], "date": slot[1]})
+        _, body = timed(client, recorder, "GET /user/dashboard", "GET", "/user/dashboard")
+        unpaid = PAY_LINK.findall(body.decode("utf-8", "ignore"))
+        if unpaid:
+            bid = unpaid[-1]
+            time.sleep(args.think_time)
+            timed(client, recorder, "GET /pay/<id>", "GET", f"/pay/{bid}")
+            status, _ = timed(client, recorder, "POST /payment_complete", "POST", "/payment_complete",
+                              {"booking_id": bid, "payment_method": rng.choice(["card", "upi", "netbanking"])})
+            if status < 400:
+                paid_q.put(bid)
+        time.sleep(args.think_time)
+
+
+def admin_loop(make_client, recorder, args, stop, paid_q):
+    client = make_client()
+    status, _ = timed(client, recorder, "POST /admin/login", "POST", "/admin/login",
+                      {"email": args.admin_email, "password": args.admin_password})
+    if status >= 400:
+        return
+    while not stop.is_set():
+        try:
+            bid = paid_q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        timed(client, recorder, "GET /admin/approve/<id>", "GET", f"/admin/approve/{bid}")
+
+
+def flood_loop(make_client, recorder, args, stop, n):
+    """Wrong-password logins for real accounts (a bcrypt check each) as fast as possible.
+
+    429s are the limiter doing its job, so they are not counted as errors.
+    """
+    rng = random.Random(args.seed * 1000 + n)
+    lo, hi = (int(x) for x in args.user_range.split("-"))
+    client = make_client(f"198.18.{n % args.flood_ips // 250}.{n % args.flood_ips % 250 + 1}")
+    if stop.wait(args.flood_delay):
+        return
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        try:
+            reply = client.request("POST", "/login", {"email": f"user{rng.randint(lo, hi)}@load.test",
+                                                      "password": "wrong"})
+        except Exception:
+            recorder.record("POST /login (flood)", time.perf_counter() - t0, False)
+            continue
+        recorder.record("POST /login (flood)", time.perf_counter() - t0, reply.status in (200, 429),
+                        reply.status, reply)
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(args):
+    if args.url:
+        make_client = lambda ip=None: HttpClient(args.url, ip, args.accept_encoding)
+    else:
+        from app import app
+        make_client = lambda ip=None: InProcessClient(app, ip, args.accept_encoding)
+
+    # first request creates tables / seeds the admin; do it once before fanning out
+    make_client().request("GET", "/")
+
+    recorder = Recorder()
+    stop = threading.Event()
+    paid_q = queue.Queue()
+    threads = [
+        threading.Thread(target=user_loop, args=(make_client, recorder, args, stop, paid_q, args.seed + i), daemon=True)
+        for i in range(args.concurrency)
+    ] + [
+        threading.Thread(target=admin_loop, args=(make_client, recorder, args, stop, paid_q), daemon=True)
+        for _ in range(args.admin_workers)
+    ]
+    if args.scenario == "login-flood":
+        threads += [
+            threading.Thread(target=flood_loop, args=(make_client, recorder, args, stop, i), daemon=True)
+            for i in range(args.flood_workers)
+        ]
+
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=30)
+    elapsed = time.perf_counter() - t0
+
+    routes = summarize(recorder, elapsed)
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "target": args.url or "in-process",
+        "concurrency": args.concurrency,
+        "admin_workers": args.admin_workers,
+        "duration_s": round(elapsed, 3),
+        "scenario": args.scenario,
+        "accept_encoding": args.accept_encoding,
+        "routes": routes,
+        "slo": check_slo(routes, args.slo_ms),
+    }
+
+
+def print_table(result):
+    print(f"{'route':32} {'count':>8} {'err':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'ttfb p95':>9} {'KB/req':>8}")
+    for route, s in result["routes"].items():
+        print(f"{route:32} {s['count']:>8} {s['errors']:>5} {s['throughput_rps']:>9.1f} "
+              f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} "
+              f"{s.get('ttfb_p95_ms', 0):>9.1f} {s.get('bytes_mean', 0) / 1024:>8.1f}")
+    slo = result["slo"]
+    print(f"SLO p95 <= {slo['p95_ms_limit']:.0f} ms on booking routes: {'PASS' if slo['ok'] else 'FAIL'}")
+    for route, v in slo["routes"].items():
+        if not v["ok"]:
+            print(f"  {route}: p95 {v['p95_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = run(args)
+    print_table(result)
+    out = args.output
+    if not out:
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        out = os.path.join(BENCH_DIR, "results", f"{stamp}-{result['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {out}")
@@ -0,0 +1,143 @@
+"""
+Compare ORM entities with the projections.py rows for the list views.
+
+    python bench/datagen.py --users 100000 --events 2000 --bookings 100000
+    python bench/projections.py --rows 100000
+
+For each list (admin bookings, admin users, admin events, one user's
+bookings) it builds the page's rows both ways, the old way being
+query.all() plus reading every attribute the template shows. The ORM side
+eager-loads booking.user / booking.event / user.bookings with selectinload,
+so this compares entities with rows, not one query with N+1 lazy loads (the
+old pages lazy-loaded, which is far slower still). Reported per side: median
+wall time over --repeat runs, peak traced memory while building the list,
+and memory still held afterwards (rows plus the session's identity map).
+Results go to bench/results/ as JSON.
+
+Point SQLALCHEMY_DATABASE_URI at the database to measure, as for the app itself.
+"""
+import os, sys, json, time, argparse, statistics, subprocess, tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+
+def cases(rows):
+    from sqlalchemy.orm import selectinload
+    from app import filter_by_when
+    from models import db, User, Event, Booking
+    import projections
+
+    busiest = (db.session.query(Booking.user_id).group_by(Booking.user_id)
+               .order_by(db.func.count(Booking.id).desc()).limit(1).scalar())
+
+    def bookings_q():
+        return filter_by_when(Booking.query, "", default_order=Booking.id.desc())
+
+    def users_q():
+        return User.query.filter_by(is_admin=False).order_by(User.id.desc())
+
+    def events_q():
+        return Event.query.order_by(Event.id.desc())
+
+    def user_bookings_q():
+        return filter_by_when(Booking.query.filter_by(user_id=busiest), "")
+
+    def touch_bookings(bs):
+        for b in bs:
+            (b.id, b.user.email, b.event.name, b.event.price, b.date, b.venue, b.status,
+             b.is_upcoming, b.paid, b.payment_reference)
+
+    def touch_users(us):
+        for u in us:
+            (u.id, u.name, u.email, len(u.bookings), u.created_at)
+
+    def touch_events(es):
+        for e in es:
+            (e.id, e.name, e.category, e.price, e.available_days, e.available_venues)
+
+    def orm(query, touch, limit=None, *relations):
+        def run():
+            out = query().options(*[selectinload(r) for r in relations]).limit(limit).all()
+            touch(out)
+            return out
+        return run
+
+    return [
+        ("admin_dashboard bookings", orm(bookings_q, touch_bookings, rows, Booking.user, Booking.event),
+         lambda: projections.booking_rows(bookings_q(), rows)),
+        ("admin_users users", orm(users_q, touch_users, rows, User.bookings),
+         lambda: projections.user_rows(users_q(), rows)),
+        ("admin_events events", orm(events_q, touch_events, rows),
+         lambda: projections.event_rows(events_q(), rows)),
+        (f"user_dashboard bookings (user #{busiest})", orm(user_bookings_q, touch_bookings, None, Booking.user, Booking.event),
+         lambda: projections.booking_rows(user_bookings_q())),
+    ]
+
+
+def measure(fn, repeat):
+    """Median seconds over `repeat` runs, then (rows, peak bytes, retained bytes) from one traced run."""
+    from models import db
+    times = []
+    for _ in range(repeat):
+        db.session.remove()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    db.session.remove()
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    out = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = len(out)
+    del out
+    db.session.remove()
+    return statistics.median(times), n, peak - base, current - base
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--rows", type=int, default=100000, help="row limit for the admin lists")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--output", default=None)
+    args = p.parse_args(argv)
+
+    from app import app
+    results = []
+    with app.app_context():
+        for label, orm, projected in cases(args.rows):
+            o_t, n, o_peak, o_kept = measure(orm, args.repeat)
+            p_t, _, p_peak, p_kept = measure(projected, args.repeat)
+            results.append({
+                "list": label, "rows": n,
+                "orm": {"ms": round(o_t * 1000, 1), "peak_mb": round(o_peak / 1e6, 1), "retained_mb": round(o_kept / 1e6, 1)},
+                "projection": {"ms": round(p_t * 1000, 1), "peak_mb": round(p_peak / 1e6, 1), "retained_mb": round(p_kept / 1e6, 1)},
+            })
+
+    print(f"{'list':42} {'rows':>7}  {'orm ms':>8} {'proj ms':>8}  {'orm MB':>12} {'proj MB':>12}")
+    for r in results:
+        o, pr = r["orm"], r["projection"]
+        print(f"{r['list']:42} {r['rows']:>7}  {o['ms']:>8} {pr['ms']:>8}  "
+              f"{o['peak_mb']:>5}/{o['retained_mb']:<6} {pr['peak_mb']:>5}/{pr['retained_mb']:<6}")
+    print("(MB = peak / retained)")
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    result = {"commit": commit, "timestamp": datetime.utcnow().isoformat(),
+              "rows": args.rows, "repeat": args.repeat, "results": results}
+    out = args.output or os.path.join(BENCH_DIR, "results", f"projections-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
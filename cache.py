@@ -0,0 +1,243 @@
+"""
+Small cache layer shared by the catalog, stats and user-identity lookups.
+
+Values are pickled and stored under "<namespace>:<version>:<key>". Bumping a
+namespace's version (bump("catalog") after an admin edits events) orphans
+every entry in it at once; orphans age out through the TTL / LRU.
+
+Backends, picked with CACHE_URL:
+
+    memory://                  per-process LRU (default; CACHE_MAX_ITEMS entries)
+    sqlite:////path/cache.db   one file shared by every worker on the host
+    redis://host:6379/0        shared across hosts (needs the redis package)
+
+With a shared backend the versions live in the backend too, so a bump in one
+gunicorn worker invalidates the others immediately. Hits, misses and the
+backend's size are published on /metrics.
+"""
+import os, time, pickle, sqlite3, threading
+from collections import OrderedDict
+
+DEFAULT_TTL = 300
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_items=10000):
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self.items = OrderedDict()  # key -> (expires, bytes)
+        self.versions = {}
+        self.nbytes = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                self._drop(key)
+                return None
+            self.items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            if key in self.items:
+                self._drop(key)
+            self.items[key] = (time.time() + ttl, value)
+            self.nbytes += len(value)
+            while len(self.items) > self.max_items:
+                self._drop(next(iter(self.items)))
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.items:
+                self._drop(key)
+
+    def _drop(self, key):
+        self.nbytes -= len(self.items.pop(key)[1])
+
+    def version(self, namespace):
+        return self.versions.get(namespace, 0)
+
+    def bump(self, namespace):
+        with self.lock:
+            self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+    def size(self):
+        return len(self.items), self.nbytes
+
+
+class SQLiteBackend:
+    """A cache table in a local SQLite file; one connection per thread."""
+    name = "sqlite"
+    PURGE_EVERY = 500
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.writes = 0
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_version (namespace TEXT PRIMARY KEY, version INTEGER)")
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl):
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                     (key, value, time.time() + ttl))
+        self.writes += 1
+        if self.writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def version(self, namespace):
+        row = self._conn().execute("SELECT version FROM cache_version WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, namespace):
+        self._conn().execute(
+            "INSERT INTO cache_version (namespace, version) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET version = version + 1", (namespace,))
+
+    def size(self):
+        n, nbytes = self._conn().execute("SELECT count(*), coalesce(sum(length(value)), 0) FROM cache").fetchone()
+        return n, nbytes
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL points at Redis but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl):
+        self.client.setex(key, int(max(1, ttl)), value)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def version(self, namespace):
+        return int(self.client.get(f"version:{namespace}") or 0)
+
+    def bump(self, namespace):
+        self.client.incr(f"version:{namespace}")
+
+    def size(self):
+        return self.client.dbsize(), self.client.info("memory").get("used_memory", 0)
+
+
+def make_backend(url, max_items=10000):
+    url = url or "memory://"
+    if url.startswith("memory://"):
+        return MemoryBackend(max_items)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"unsupported CACHE_URL {url!r}")
+
+
+_settings = {"backend": MemoryBackend(), "ttl": DEFAULT_TTL}
+_stats_lock = threading.Lock()
+_stats = {}  # namespace -> [hits, misses]
+
+
+def configure(url=None, max_items=10000, ttl=DEFAULT_TTL):
+    _settings["backend"] = make_backend(url, max_items)
+    _settings["ttl"] = ttl
+
+
+def _key(namespace, key):
+    return f"{namespace}:{_settings['backend'].version(namespace)}:{key}"
+
+
+def _count(namespace, hit):
+    with _stats_lock:
+        s = _stats.setdefault(namespace, [0, 0])
+        s[0 if hit else 1] += 1
+
+
+def get_or_set(namespace, key, compute, ttl=None):
+    """Return the cached value for (namespace, key), computing and storing it on a miss."""
+    backend = _settings["backend"]
+    full_key = _key(namespace, key)
+    raw = backend.get(full_key)
+    if raw is not None:
+        _count(namespace, True)
+        return pickle.loads(raw)
+    _count(namespace, False)
+    value = compute()
+    backend.set(full_key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl or _settings["ttl"])
+    return value
+
+
+def delete(namespace, key):
+    _settings["backend"].delete(_key(namespace, key))
+
+
+def bump(namespace):
+    """Invalidate every entry in `namespace`, in all workers sharing the backend."""
+    _settings["backend"].bump(namespace)
+
+
+def stats():
+    """Hit/miss counts per namespace plus the backend's item count and size in bytes."""
+    with _stats_lock:
+        per_ns = {ns: {"hits": h, "misses": m, "hit_ratio": h / (h + m) if h + m else 0.0}
+                  for ns, (h, m) in _stats.items()}
+    backend = _settings["backend"]
+    items, nbytes = backend.size()
+    return {"backend": backend.name, "items": items, "bytes": nbytes, "namespaces": per_ns}
+
+
+def init_app(app):
+    """Configure the backend from CACHE_URL / CACHE_MAX_ITEMS / CACHE_TTL and publish metrics."""
+    import metrics
+    app.config.setdefault("CACHE_URL", os.getenv("CACHE_URL", "memory://"))
+    app.config.setdefault("CACHE_MAX_ITEMS", int(os.getenv("CACHE_MAX_ITEMS", "10000")))
+    app.config.setdefault("CACHE_TTL", int(os.getenv("CACHE_TTL", str(DEFAULT_TTL))))
+    configure(app.config["CACHE_URL"], app.config["CACHE_MAX_ITEMS"], app.config["CACHE_TTL"])
+
+    def collect():
+        s = stats()
+        backend = (("backend", s["backend"]),)
+        out = [("cache_items", backend, s["items"]), ("cache_bytes", backend, s["bytes"])]
+        for ns, v in sorted(s["namespaces"].items()):
+            labels = (("namespace", ns),)
+            out.append(("cache_hits_total", labels, v["hits"]))
+            out.append(("cache_misses_total", labels, v["misses"]))
+            out.append(("cache_hit_ratio", labels, v["hit_ratio"]))
+        return out
+
+    metrics.registry.describe("cache_items", "gauge", "Entries held by the cache backend.")
+    metrics.registry.describe("cache_bytes", "gauge", "Bytes held by the cache backend.")
+    metrics.registry.describe("cache_hits_total", "counter", "Cache hits by namespace (this process).")
+    metrics.registry.describe("cache_misses_total", "counter", "Cache misses by namespace (this process).")
+    metrics.registry.describe("cache_hit_ratio", "gauge", "Cache hits / lookups by namespace (this process).")
+    metrics.registry.add_collector(collect)
@@ -0,0 +1,147 @@
+"""
+gzip / brotli compression of dynamic responses.
+
+An after_request hook compresses HTML, JSON, CSV and other text responses
+when the client accepts it (brotli if the brotli package is installed,
+otherwise gzip) and the body is at least COMPRESS_MIN_SIZE bytes (default
+1024). Streamed responses (the exports) are compressed as they are
+generated, with a flush after every chunk so the client still receives data
+progressively; their size is not known up front, so they are always
+compressed.
+
+Responses made with send_file (receipts, static files) are left alone: PDFs
+do not shrink, and static files have precompressed variants (assets.py).
+
+HTML for a request with a session (logged in, or holding a CSRF token) and
+any response setting a cookie is never compressed either: such pages carry a
+CSRF token next to reflected form input, and compressing them on the fly
+would let an attacker recover the token from response sizes (BREACH). That
+leaves public pages, JSON and the exports compressed.
+COMPRESS_ENABLED=0 turns this off, e.g. when a reverse proxy compresses.
+"""
+import os, zlib
+from flask import current_app, request, session
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIMETYPES = (
+    "text/html", "text/plain", "text/csv", "text/css", "text/javascript",
+    "application/json", "application/x-ndjson", "application/javascript", "image/svg+xml",
+)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # 11 is for build time; 4-5 is about as fast as gzip -6 and smaller
+
+metrics.registry.describe("compression_bytes_total", "counter",
+                          "Bytes of buffered responses before (stage=in) and after (stage=out) compression.")
+
+
+def accepted_encoding():
+    """The encoding to use for this request ("br", "gzip") or None."""
+    accept = request.accept_encodings
+    if brotli is not None and accept["br"]:
+        return "br"
+    if accept["gzip"]:
+        return "gzip"
+    return None
+
+
+class GzipCompressor:
+    def __init__(self, level=GZIP_LEVEL):
+        self.z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def compress(self, data):
+        return self.z.compress(data)
+
+    def flush(self):
+        return self.z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.z.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality=BROTLI_QUALITY):
+        self.c = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.c.process(data)
+
+    def flush(self):
+        return self.c.flush()
+
+    def finish(self):
+        return self.c.finish()
+
+
+COMPRESSORS = {"gzip": GzipCompressor, "br": BrotliCompressor}
+
+
+def compress_stream(chunks, compressor, charset="utf-8"):
+    """Compress an iterable of str/bytes chunks, flushing after each one."""
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(charset)
+            out = compressor.compress(chunk) + compressor.flush()
+            if out:
+                yield out
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def may_hold_secrets(response):
+    """True for responses that can mix a session secret with attacker-chosen input."""
+    if "Set-Cookie" in response.headers:
+        return True
+    if response.mimetype != "text/html":
+        return False
+    return bool(session) or current_app.config["SESSION_COOKIE_NAME"] in request.cookies
+
+
+def compress_response(response):
+    config = current_app.config
+    if (not config["COMPRESS_ENABLED"]
+            or request.method == "HEAD"
+            or response.direct_passthrough
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in config["COMPRESS_MIMETYPES"]
+            or may_hold_secrets(response)):
+        return response
+
+    streamed = response.is_streamed
+    if not streamed:
+        data = response.get_data()
+        if len(data) < config["COMPRESS_MIN_SIZE"]:
+            return response
+    response.vary.add("Accept-Encoding")
+    encoding = accepted_encoding()
+    if encoding is None:
+        return response
+
+    compressor = COMPRESSORS[encoding]()
+    if streamed:
+        response.response = compress_stream(response.response, compressor)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = compressor.compress(data) + compressor.finish()
+        response.set_data(body)
+        metrics.registry.inc("compression_bytes_total", len(data), encoding=encoding, stage="in")
+        metrics.registry.inc("compression_bytes_total", len(body), encoding=encoding, stage="out")
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    """Register the compression hook. Call it before other after_request hooks so it runs last."""
+    app.config.setdefault("COMPRESS_ENABLED", os.getenv("COMPRESS_ENABLED", "1") == "1")
+    app.config.setdefault("COMPRESS_MIN_SIZE", int(os.getenv("COMPRESS_MIN_SIZE", "1024")))
+    app.config.setdefault("COMPRESS_MIMETYPES", MIMETYPES)
+    app.after_request(compress_response)
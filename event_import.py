@@ -0,0 +1,192 @@
+"""
+Bulk event import from CSV, JSON or NDJSON.
+
+Files are parsed incrementally (csv.DictReader over the upload stream, and a
+raw_decode loop for JSON arrays / NDJSON) so a large file is never held in
+memory. Every row is checked with the same rules as the event form and the
+editor's Validate button (forms.available_dates_error), plus the venue/date
+slots already held by other events' bookings (see occupancy.py). Valid rows
+go in with one executemany INSERT per batch; invalid rows are skipped and
+listed in the report by row number.
+
+CSV files need a header with the FIELDS below; available_dates is the same
+JSON text the form takes. JSON files are an array of objects (or one object
+per line) with the same keys; available_dates may be an object or a string.
+"""
+import io, csv, json, math
+from datetime import date, datetime
+from forms import available_dates_error
+from models import db, Event
+from occupancy import venue_key, held_slots
+
+FIELDS = ["name", "category", "price", "available_days", "available_venues", "available_dates"]
+BATCH_ROWS = 1000
+MAX_ERRORS = 1000        # errors kept for the report; the rest are only counted
+MAX_RECORD_CHARS = 1 << 20
+
+# (min, max) lengths, as in forms.EventForm
+LENGTHS = {
+    "name": (2, 200),
+    "category": (2, 100),
+    "available_days": (3, 200),
+    "available_venues": (3, 400),
+    "available_dates": (2, 2000),
+}
+
+
+class ImportReport:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []  # (row number, message)
+        self.fatal = None
+
+    def error(self, row_no, message):
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((row_no, message))
+
+    @property
+    def ok(self):
+        return self.fatal is None and self.failed == 0
+
+
+def detect_format(filename):
+    ext = (filename or "").rsplit(".", 1)[-1].lower()
+    return "csv" if ext == "csv" else "json" if ext in ("json", "ndjson") else None
+
+
+def iter_csv(stream):
+    """Yield (line number, row dict) from a CSV byte stream."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    missing = [f for f in FIELDS if f not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"missing column(s): {', '.join(missing)}")
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_json(stream, chunk_size=1 << 16):
+    """Yield (record number, object) from a JSON array or NDJSON byte stream."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    n = 0
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                return
+            chunk = text.read(chunk_size)
+            buf, pos, eof = chunk, 0, not chunk
+            continue
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except ValueError as e:
+            if eof or len(buf) - pos > MAX_RECORD_CHARS:
+                raise ValueError(f"record {n + 1}: invalid JSON ({e})")
+            chunk = text.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+        n += 1
+        pos = end
+        yield n, obj
+
+
+def parse_row(raw):
+    """Validate one input row. Returns ((event table values, parsed dates), None) or (None, error)."""
+    if not isinstance(raw, dict):
+        return None, "expected an object with the event fields"
+    values = {}
+    for field in ("name", "category", "available_days", "available_venues"):
+        v = raw.get(field)
+        v = "" if v is None else str(v).strip()
+        lo, hi = LENGTHS[field]
+        if not lo <= len(v) <= hi:
+            return None, f"{field} must be {lo}-{hi} characters"
+        values[field] = v
+
+    try:
+        price = float(raw.get("price"))
+    except (TypeError, ValueError):
+        return None, "price must be a number"
+    if not math.isfinite(price) or price < 0:
+        return None, "price must be >= 0"
+    values["price"] = price
+
+    dates = raw.get("available_dates")
+    if isinstance(dates, str):
+        text = dates.strip()
+        try:
+            dates = json.loads(text)
+        except ValueError as e:
+            return None, f"available_dates: invalid JSON ({e})"
+    else:
+        text = json.dumps(dates)
+    lo, hi = LENGTHS["available_dates"]
+    if not lo <= len(text) <= hi:
+        return None, f"available_dates must be {lo}-{hi} characters"
+    error = available_dates_error(dates)
+    if error:
+        return None, f"available_dates: {error}"
+    values["available_dates"] = text
+    return (values, dates), None
+
+
+def _insert_batch(batch, report, now):
+    """Drop rows whose dates are held by another event, then insert the rest."""
+    wanted = set()
+    for _, _, dates in batch:
+        for v, ds in dates.items():
+            key = venue_key(v)
+            wanted.update((key, d) for d in ds)
+    days = {d: date.fromisoformat(d) for d in {d for _, d in wanted}}
+    held = {(k, day.isoformat()): e for (k, day), e in held_slots((k, days[d]) for k, d in wanted).items()}
+
+    rows = []
+    for row_no, values, dates in batch:
+        clashes = held and sorted((v, d, held[(venue_key(v), d)])
+                                  for v, ds in dates.items() for d in ds
+                                  if (venue_key(v), d) in held)
+        if clashes:
+            shown = ", ".join(f"{v} on {d} (event #{e})" for v, d, e in clashes[:3])
+            report.error(row_no, f"already booked for another event: {shown}")
+            continue
+        values["created_at"] = now
+        rows.append(values)
+
+    if rows and not report.dry_run:
+        db.session.execute(Event.__table__.insert(), rows)
+        db.session.commit()
+    report.imported += len(rows)
+
+
+def import_events(stream, fmt, dry_run=False, batch_size=BATCH_ROWS):
+    """
+    Import events from a byte stream in format "csv" or "json". Returns an
+    ImportReport; with `dry_run` everything is validated but nothing written.
+    """
+    report = ImportReport(dry_run)
+    records = iter_csv(stream) if fmt == "csv" else iter_json(stream)
+    now = datetime.utcnow()
+    batch = []
+    try:
+        for row_no, raw in records:
+            report.rows += 1
+            parsed, error = parse_row(raw)
+            if error:
+                report.error(row_no, error)
+                continue
+            batch.append((row_no,) + parsed)
+            if len(batch) >= batch_size:
+                _insert_batch(batch, report, now)
+                batch = []
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        report.fatal = str(e)
+    if batch:
+        _insert_batch(batch, report, now)
+    report.errors.sort()
+    return report
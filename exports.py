@@ -0,0 +1,88 @@
+"""
+Streaming CSV / NDJSON exports for admins.
+
+The queries select plain columns (no ORM entities, no identity map) and run
+with yield_per, which makes SQLAlchemy use a server-side cursor where the
+driver supports one. Rows are encoded in chunks and handed to a generator
+response, so memory stays flat whatever the row count.
+"""
+import io, csv, json
+from datetime import date, datetime
+from models import db, User, Event, Booking
+import archive
+
+CHUNK_ROWS = 1000
+
+BOOKING_COLUMNS = [
+    ("id", Booking.id),
+    ("user_name", User.name),
+    ("user_email", User.email),
+    ("event", Event.name),
+    ("category", Event.category),
+    ("date", Booking.date),
+    ("venue", Booking.venue),
+    ("status", Booking.status),
+    ("paid", Booking.paid),
+    ("amount", Booking.amount),
+    ("payment_reference", Booking.payment_reference),
+    ("created_at", Booking.created_at),
+    ("paid_at", Booking.paid_at),
+    ("decided_at", Booking.decided_at),
+]
+
+
+def bookings_query(base):
+    """Export columns for the bookings matched by `base` (a Booking query)."""
+    return (base.join(User, User.id == Booking.user_id)
+                .join(Event, Event.id == Booking.event_id)
+                .with_entities(*[col for _, col in BOOKING_COLUMNS]))
+
+
+def users_query(base):
+    """Export columns for the users matched by `base` (a User query), with booking counts (live and archived)."""
+    counts = archive.booking_counts_by_user()
+    return (base.outerjoin(counts, counts.c.user_id == User.id)
+                .with_entities(User.id, User.name, User.email,
+                               db.func.coalesce(counts.c.n, 0), User.created_at, User.last_login))
+
+
+USER_FIELDS = ["id", "name", "email", "bookings", "created_at", "last_login"]
+BOOKING_FIELDS = [name for name, _ in BOOKING_COLUMNS]
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(query, fields):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(fields)
+    n = 0
+    for row in query.execution_options(yield_per=CHUNK_ROWS):
+        writer.writerow([_plain(v) for v in row])
+        n += 1
+        if n % CHUNK_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def iter_ndjson(query, fields):
+    lines = []
+    for row in query.execution_options(yield_per=CHUNK_ROWS):
+        lines.append(json.dumps(dict(zip(fields, (_plain(v) for v in row)))))
+        if len(lines) >= CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+FORMATS = {
+    "csv": (iter_csv, "text/csv"),
+    "ndjson": (iter_ndjson, "application/x-ndjson"),
+}
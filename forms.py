@@ -1,6 +1,9 @@
+import json
+from datetime import date
 from flask_wtf import FlaskForm
-from wtforms import StringField, FloatField, SubmitField, TextAreaField
-from wtforms.validators import DataRequired, Length, NumberRange
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, FloatField, SubmitField, TextAreaField, BooleanField
+from wtforms.validators import DataRequired, Length, NumberRange, ValidationError
 
 class EventForm(FlaskForm):
     name = StringField('Event Name', validators=[DataRequired(), Length(min=2, max=200)])
@@ -10,3 +13,43 @@ class EventForm(FlaskForm):
     available_venues = StringField('Available Venues', validators=[DataRequired(), Length(min=3, max=400)])
     available_dates = TextAreaField('Available Dates (JSON mapping venue -> [dates])', validators=[DataRequired(), Length(min=2, max=2000)])
     submit = SubmitField('Save Event')
+
+    def validate_available_dates(self, field):
+        try:
+            parsed = json.loads(field.data or '')
+        except ValueError as e:
+            raise ValidationError(f'Invalid JSON: {e}')
+        error = available_dates_error(parsed)
+        if error:
+            raise ValidationError(error)
+
+class EventImportForm(FlaskForm):
+    file = FileField('Events file (CSV, JSON or NDJSON)', validators=[FileRequired(), FileAllowed(['csv', 'json', 'ndjson'], 'CSV, JSON or NDJSON files only')])
+    dry_run = BooleanField('Validate only (do not import)')
+    submit = SubmitField('Import Events')
+
+def is_date_string(d):
+    """True for a real calendar date written as YYYY-MM-DD."""
+    if not isinstance(d, str) or len(d) != 10:
+        return False
+    try:
+        date.fromisoformat(d)
+    except ValueError:
+        return False
+    return True
+
+def available_dates_error(parsed):
+    """
+    The available_dates rules shared by the editor's Validate button and the
+    bulk importer: a JSON object mapping venue -> list of YYYY-MM-DD strings.
+    Returns an error message, or None when the mapping is valid.
+    """
+    if not isinstance(parsed, dict):
+        return 'JSON must be an object mapping venue->dates list'
+    for venue, dates in parsed.items():
+        if not isinstance(dates, list):
+            return 'Each venue must map to a list of date strings'
+        for d in dates:
+            if not is_date_string(d):
+                return f'{venue}: {d!r} is not a YYYY-MM-DD date'
+    return None
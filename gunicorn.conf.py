@@ -0,0 +1,13 @@
+# gunicorn settings: `gunicorn -c gunicorn.conf.py app:app`
+import os
+
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+
+
+def post_fork(server, worker):
+    # ReportLab is imported lazily by download_receipt; set PREWARM_RECEIPTS=1
+    # to load it in each worker before it starts taking requests instead.
+    if os.getenv("PREWARM_RECEIPTS", "0") == "1":
+        import receipts
+        receipts.prewarm()
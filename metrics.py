@@ -0,0 +1,230 @@
+"""
+Per-route performance instrumentation exposed at /metrics (Prometheus text format).
+
+Records:
+    http_request_duration_seconds   latency histogram per endpoint/method/status
+    sql_queries_total / sql_query_duration_seconds   via SQLAlchemy cursor events
+    request_sql_queries             queries issued per request, per endpoint
+    operation_duration_seconds      timed() blocks: log file I/O, bcrypt, PDF build
+
+Everything lives in process memory behind one lock, so the cost per request is
+a handful of dict updates. Set PROFILE_SAMPLE_RATE (0..1) to also capture a
+cProfile dump for a sample of requests into PROFILE_DIR.
+
+/metrics needs METRICS_TOKEN (as a bearer token) when one is set. Without a
+token it answers only direct requests from loopback (a scraper on the same
+host); anything else, including requests relayed by a local reverse proxy
+(X-Forwarded-For), gets 404.
+"""
+import os, time, random, bisect, threading, ipaddress, cProfile
+from contextlib import contextmanager
+from flask import g, request, has_request_context, Response, abort
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.collectors = []
+        self.help = {}
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = Histogram(buckets)
+            h.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add_collector(self, fn):
+        """Register fn() -> [(name, label pairs, value)], sampled on every render."""
+        self.collectors.append(fn)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        seen = set()
+
+        def header(name):
+            if name not in seen and name in self.help:
+                kind, text = self.help[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+            seen.add(name)
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                header(name)
+                lines.append(f"{name}{_labels(labels)} {_num(value)}")
+            for (name, labels), h in sorted(self.histograms.items(), key=lambda kv: kv[0]):
+                header(name)
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _num(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {h.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_num(h.sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        for fn in self.collectors:
+            for name, labels, value in sorted(fn(), key=lambda row: row[0]):
+                header(name)
+                lines.append(f"{name}{_labels(labels)} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+registry = Registry()
+registry.describe("http_request_duration_seconds", "histogram", "Request latency by endpoint.")
+registry.describe("sql_queries_total", "counter", "SQL statements executed.")
+registry.describe("sql_query_duration_seconds", "histogram", "SQL statement latency by endpoint.")
+registry.describe("request_sql_queries", "histogram", "SQL statements issued per request.")
+registry.describe("operation_duration_seconds", "histogram", "Timed blocks: log I/O, bcrypt, PDF build.")
+
+
+def current_endpoint():
+    if has_request_context():
+        return request.endpoint or "unmatched"
+    return "none"
+
+
+@contextmanager
+def timed(op):
+    """Time a block of work: `with timed("bcrypt_check"): ...`"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe("operation_duration_seconds", time.perf_counter() - t0,
+                         op=op, endpoint=current_endpoint())
+
+
+# ------------------ SQL HOOKS ------------------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # on the per-statement context: after_cursor_execute never runs for a
+    # statement that raises, so anything kept on the pooled connection leaks
+    context._metrics_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    endpoint = current_endpoint()
+    registry.inc("sql_queries_total", endpoint=endpoint)
+    registry.observe("sql_query_duration_seconds", elapsed, endpoint=endpoint)
+    if has_request_context():
+        g._sql_queries = g.get("_sql_queries", 0) + 1
+
+
+# ------------------ REQUEST HOOKS ------------------
+
+_profile_lock = threading.Lock()
+
+
+def _is_local_request():
+    """A request made directly from this host, not relayed by a proxy."""
+    if "X-Forwarded-For" in request.headers:
+        return False
+    try:
+        return ipaddress.ip_address(request.remote_addr or "").is_loopback
+    except ValueError:
+        return False
+
+
+def init_app(app):
+    """Register request timing hooks and the /metrics endpoint on `app`.
+
+    Call this before other before_request hooks so their time is included.
+    """
+    app.config.setdefault("PROFILE_SAMPLE_RATE", float(os.getenv("PROFILE_SAMPLE_RATE", "0")))
+    app.config.setdefault("PROFILE_DIR", os.getenv("PROFILE_DIR", os.path.join(app.root_path, "profiles")))
+    app.config.setdefault("METRICS_TOKEN", os.getenv("METRICS_TOKEN"))
+
+    @app.before_request
+    def _metrics_before():
+        g._metrics_start = time.perf_counter()
+        g._sql_queries = 0
+        rate = app.config["PROFILE_SAMPLE_RATE"]
+        if rate and random.random() < rate and _profile_lock.acquire(blocking=False):
+            # only one sampled profile at a time keeps the overhead bounded
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+                g._profiler = prof
+            except ValueError:
+                _profile_lock.release()
+
+    @app.after_request
+    def _metrics_after(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown(exc):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        endpoint = current_endpoint()
+        status = g.pop("_metrics_status", 500 if exc else 200)
+        registry.observe("http_request_duration_seconds", elapsed,
+                         endpoint=endpoint, method=request.method, status=status)
+        registry.observe("request_sql_queries", g.pop("_sql_queries", 0),
+                         buckets=COUNT_BUCKETS, endpoint=endpoint)
+        prof = g.pop("_profiler", None)
+        if prof is not None:
+            try:
+                prof.disable()
+                os.makedirs(app.config["PROFILE_DIR"], exist_ok=True)
+                name = f"{endpoint}-{int(time.time() * 1000)}.prof"
+                prof.dump_stats(os.path.join(app.config["PROFILE_DIR"], name))
+            finally:
+                _profile_lock.release()
+
+    @app.route("/metrics")
+    def metrics():
+        token = app.config["METRICS_TOKEN"]
+        if not token:
+            if not _is_local_request():
+                abort(404)
+        elif request.headers.get("Authorization") != f"Bearer {token}":
+            abort(401)
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,150 @@
+"""
+One-off schema migrations for existing databases.
+
+db.create_all() only creates missing tables, so column changes on a database
+that predates them are applied here, via `flask <command>` (registered in
+app.py). Every step is idempotent and reports what it did.
+"""
+import json
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn, CreateTable, CreateIndex
+from models import db, Event, Booking
+from forms import is_date_string
+
+
+def migrate_booking_dates(apply=False):
+    """
+    Convert booking.date from free-form strings to a real DATE column.
+
+    Every value is parsed as YYYY-MM-DD. Returns (converted, bad) where bad is
+    a list of (booking_id, raw_value) that could not be parsed. Nothing is
+    written unless `apply` is set and there are no bad values: fix or delete
+    those bookings first, then re-run.
+    """
+    engine = db.engine
+    rows = db.session.execute(text("SELECT id, date FROM booking")).all()
+
+    converted, bad = [], []
+    for booking_id, raw in rows:
+        try:
+            parsed = raw if hasattr(raw, "isoformat") else datetime.strptime(str(raw).strip(), "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            bad.append((booking_id, raw))
+            continue
+        if str(raw) != parsed.isoformat():
+            converted.append((booking_id, parsed))
+
+    if not apply or bad:
+        return converted, bad
+
+    if engine.dialect.name == "sqlite":
+        # SQLite has no DATE storage class; SQLAlchemy stores ISO strings, so
+        # normalising the text is the whole conversion.
+        for booking_id, parsed in converted:
+            db.session.execute(text("UPDATE booking SET date = :d WHERE id = :id"),
+                               {"d": parsed.isoformat(), "id": booking_id})
+    elif engine.dialect.name == "postgresql":
+        db.session.execute(text("ALTER TABLE booking ALTER COLUMN date TYPE DATE USING date::date"))
+    else:
+        db.session.execute(text("ALTER TABLE booking MODIFY date DATE NOT NULL"))
+
+    indexes = {ix["name"] for ix in inspect(engine).get_indexes("booking")}
+    if "ix_booking_date" not in indexes:
+        db.session.execute(text("CREATE INDEX ix_booking_date ON booking (date)"))
+    db.session.commit()
+    return converted, bad
+
+
+def clean_event_dates(apply=False):
+    """
+    Drop entries from Event.available_dates that are not real YYYY-MM-DD
+    dates (e.g. "2026-02-29"), which the event editor now rejects, so such
+    events can be edited again.
+
+    Returns (dropped, unreadable): dropped is a list of (event_id, venue,
+    raw_value) removed, unreadable a list of event ids whose available_dates
+    is not a JSON object of lists and needs fixing by hand. Nothing is
+    written unless `apply` is set.
+    """
+    dropped, unreadable = [], []
+    for event in Event.query.order_by(Event.id):
+        try:
+            av = json.loads(event.available_dates or "{}")
+        except ValueError:
+            av = None
+        if not isinstance(av, dict) or not all(isinstance(v, list) for v in av.values()):
+            unreadable.append(event.id)
+            continue
+        bad = [(venue, d) for venue, dates in av.items() for d in dates if not is_date_string(d)]
+        if not bad:
+            continue
+        dropped.extend((event.id, venue, d) for venue, d in bad)
+        if apply:
+            event.available_dates = json.dumps(
+                {venue: [d for d in dates if is_date_string(d)] for venue, dates in av.items()})
+    if apply:
+        db.session.commit()
+    return dropped, unreadable
+
+
+def add_missing_columns():
+    """
+    Create missing tables and add nullable columns that the models define but
+    the database lacks (ALTER TABLE ... ADD COLUMN). Returns the list of
+    "table.column" names added.
+    """
+    db.create_all()
+    engine = db.engine
+    insp = inspect(engine)
+    quote = engine.dialect.identifier_preparer.format_table
+    added = []
+    for table in db.metadata.sorted_tables:
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                raise RuntimeError(f"{table.name}.{column.name} is NOT NULL; add it by hand with a default")
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            db.session.execute(text(f"ALTER TABLE {quote(table)} ADD COLUMN {ddl}"))
+            added.append(f"{table.name}.{column.name}")
+    db.session.commit()
+    return added
+
+
+def monotonic_booking_ids():
+    """
+    Make sure new booking ids are never reused, so they cannot collide with
+    archived ones (archive.py keeps ids). On SQLite that means rebuilding an
+    old booking table with AUTOINCREMENT; on every SQLite database the
+    sequence is then moved past the highest archived id. Other databases
+    use sequences, which never go back. Returns (rebuilt, clashes): whether
+    the table was rebuilt, and the ids present in both tables (left alone,
+    but they stop archive-bookings until resolved by hand).
+    """
+    engine = db.engine
+    rebuilt = False
+    if engine.dialect.name == "sqlite":
+        sql = db.session.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'booking'")).scalar()
+        if sql and "AUTOINCREMENT" not in sql.upper():
+            table = Booking.__table__
+            cols = ", ".join(c.name for c in table.columns)
+            db.session.execute(text("ALTER TABLE booking RENAME TO booking_old"))
+            db.session.execute(CreateTable(table))
+            db.session.execute(text(f"INSERT INTO booking ({cols}) SELECT {cols} FROM booking_old"))
+            db.session.execute(text("DROP TABLE booking_old"))
+            for index in table.indexes:
+                db.session.execute(CreateIndex(index))
+            rebuilt = True
+        top = db.session.execute(text(
+            "SELECT max(coalesce((SELECT max(id) FROM booking), 0), coalesce((SELECT max(id) FROM booking_archive), 0))")).scalar()
+        seq = db.session.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'booking'")).scalar()
+        if seq is None:
+            db.session.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('booking', :top)"), {"top": top})
+        elif seq < top:
+            db.session.execute(text("UPDATE sqlite_sequence SET seq = :top WHERE name = 'booking'"), {"top": top})
+    clashes = [i for (i,) in db.session.execute(text(
+        "SELECT booking.id FROM booking JOIN booking_archive ON booking_archive.id = booking.id ORDER BY booking.id"))]
+    db.session.commit()
+    return rebuilt, clashes
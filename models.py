@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime, date
 
 db = SQLAlchemy()
@@ -35,11 +36,11 @@ class Event(db.Model):
     def __repr__(self):
         return f'<Event {self.name}>'
 
-class Booking(db.Model):
+class BookingColumns:
+    """Columns shared by Booking and BookingArchive, so rows move between them column for column."""
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
-    date = db.Column(db.String(100), nullable=False)
+    # real DATE column (was a string); indexed so upcoming/past filters and sorts run in SQL
+    date = db.Column(db.Date, nullable=False, index=True)
     venue = db.Column(db.String(200), nullable=True)
     day = db.Column(db.String(100), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -47,7 +48,117 @@ class Booking(db.Model):
     paid = db.Column(db.Boolean, default=False)
     payment_reference = db.Column(db.String(200), nullable=True)
     rejection_reason = db.Column(db.String(255), nullable=True)
+    # what was actually charged, so revenue survives later price edits
+    amount = db.Column(db.Float, nullable=True)
+    paid_at = db.Column(db.DateTime, nullable=True)
+    decided_at = db.Column(db.DateTime, nullable=True)  # approved/rejected by admin
+
+    @hybrid_property
+    def is_upcoming(self):
+        return self.date is not None and self.date >= date.today()
+
+    @is_upcoming.expression
+    def is_upcoming(cls):
+        return cls.date >= date.today()
+
 
+class Booking(BookingColumns, db.Model):
+    # AUTOINCREMENT: SQLite would otherwise reuse max(id) + 1 once archival
+    # deletes the newest rows, and archived bookings keep their ids
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
 
     def __repr__(self):
         return f'<Booking {self.id}>'
+
+
+class BookingArchive(BookingColumns, db.Model):
+    """Bookings for past dates, moved out of Booking by archive.py (ids are kept)."""
+    __tablename__ = 'booking_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    event_id = db.Column(db.Integer, nullable=False, index=True)  # no FK: history outlives deleted events
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # the event as it was when archived, for receipts and rollups once it is deleted
+    event_name = db.Column(db.String(200), nullable=True)
+    event_category = db.Column(db.String(100), nullable=True)
+    event_price = db.Column(db.Float, nullable=True)
+
+    user = db.relationship('User', viewonly=True)
+    event = db.relationship('Event', primaryjoin='foreign(BookingArchive.event_id) == Event.id', viewonly=True)
+
+    def __repr__(self):
+        return f'<BookingArchive {self.id}>'
+
+
+class VenueOccupancy(db.Model):
+    """Which event holds a physical venue on a given day (one row per venue/date)."""
+    __table_args__ = (db.UniqueConstraint('venue_key', 'date', name='uq_venue_occupancy_venue_date'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    venue_key = db.Column(db.String(200), nullable=False)  # lower-cased, trimmed venue name
+    date = db.Column(db.Date, nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False, index=True)
+    bookings = db.Column(db.Integer, default=0)  # live (non-rejected) bookings holding the slot
+
+    def __repr__(self):
+        return f'<VenueOccupancy {self.venue_key} {self.date} event={self.event_id}>'
+
+
+class DailyRollup(db.Model):
+    """Booking and revenue totals per day, event, category and venue (maintained by rollups.py)."""
+    __table_args__ = (db.UniqueConstraint('day', 'event_id', 'category', 'venue', name='uq_daily_rollup_key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    event_id = db.Column(db.Integer, nullable=False, index=True)  # no FK: totals outlive deleted events
+    category = db.Column(db.String(100), nullable=False, default='')
+    venue = db.Column(db.String(200), nullable=False, default='')
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    paid = db.Column(db.Integer, nullable=False, default=0)
+    approved = db.Column(db.Integer, nullable=False, default=0)
+    rejected = db.Column(db.Integer, nullable=False, default=0)
+    refunded = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)  # net of refunds
+
+    def __repr__(self):
+        return f'<DailyRollup {self.day} event={self.event_id} {self.venue}>'
+
+
+class Notification(db.Model):
+    """Outbox row: one message for one channel, written in the same commit as the change it reports."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    booking_id = db.Column(db.Integer, nullable=True)  # no FK: the record outlives the booking
+    kind = db.Column(db.String(50), nullable=False)     # booking_approved / booking_rejected
+    channel = db.Column(db.String(20), nullable=False)  # email / webhook / inbox
+    payload = db.Column(db.Text, nullable=False)        # JSON
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/sent/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(32), nullable=True)  # dispatcher holding the row
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_notification_due', 'status', 'next_attempt_at'),)
+
+    def __repr__(self):
+        return f'<Notification {self.id} {self.kind} via {self.channel} {self.status}>'
+
+
+class InboxMessage(db.Model):
+    """In-app notification shown on the user dashboard."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    booking_id = db.Column(db.Integer, nullable=True)
+    title = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    read_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<InboxMessage {self.id} user={self.user_id}>'
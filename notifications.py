@@ -0,0 +1,261 @@
+"""
+Transactional outbox for booking notifications.
+
+admin_approve / admin_reject call enqueue() before their commit, so the
+Notification rows (one per channel in NOTIFY_CHANNELS) are written in the
+same transaction as the status change: no decision without its message, and
+no message for a change that rolled back. The request only does that INSERT
+and a non-blocking wake().
+
+A dispatcher thread in each worker drains due rows in batches. Rows are
+claimed with a conditional UPDATE (claimed_by + a lease on next_attempt_at),
+so several workers can share the table without double delivery; a claim left
+by a crashed worker expires with its lease. LEASE covers a whole batch of
+sends at SEND_TIMEOUT, and a row's outcome is only written while the claim is
+still held. Failures are retried with
+exponential backoff and jitter, then marked failed after MAX_ATTEMPTS.
+
+Channels:
+    inbox    InboxMessage row shown on the user dashboard (same commit as "sent")
+    email    SMTP to NOTIFY_SMTP_HOST:NOTIFY_SMTP_PORT (default a local debug
+             server on localhost:1025, e.g. `python -m aiosmtpd -n`)
+    webhook  JSON POST to NOTIFY_WEBHOOK_URL
+
+Set NOTIFY_DISPATCHER=off to run delivery elsewhere with
+`flask send-notifications --loop`.
+"""
+import os, json, uuid, random, smtplib, logging, threading, urllib.request
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from flask import current_app
+from models import db, Notification, InboxMessage
+import metrics
+
+log = logging.getLogger(__name__)
+
+BATCH = 20
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 5        # seconds before the first retry, doubled each attempt
+BACKOFF_MAX = 3600
+SEND_TIMEOUT = 10       # per socket operation (connect, each SMTP command, ...)
+# long enough for a whole batch of slow sends (about 3 socket waits each), so
+# another dispatcher never takes over rows this one is still working through
+LEASE = timedelta(seconds=BATCH * SEND_TIMEOUT * 3)
+
+metrics.registry.describe("notifications_total", "counter", "Notification delivery attempts by channel and result.")
+
+
+# ------------------ ENQUEUE ------------------
+
+def enqueue(booking, kind, **extra):
+    """Add outbox rows for `booking` to the current session; the caller commits."""
+    user = booking.user
+    payload = {
+        "kind": kind,
+        "booking_id": booking.id,
+        "user_name": user.name,
+        "email": user.email,
+        "event": booking.event.name,
+        "date": booking.date.isoformat(),
+        "venue": booking.venue,
+        "status": booking.status,
+    }
+    payload.update(extra)
+    body = json.dumps(payload)
+    for channel in current_app.config["NOTIFY_CHANNELS"]:
+        db.session.add(Notification(user_id=user.id, booking_id=booking.id, kind=kind,
+                                    channel=channel, payload=body))
+
+
+def render(payload):
+    """(subject, text) for a payload."""
+    what = f"{payload['event']} on {payload['date']} at {payload['venue']}"
+    if payload["kind"] == "booking_approved":
+        return (f"Booking #{payload['booking_id']} approved",
+                f"Hi {payload['user_name']}, your booking for {what} has been approved. "
+                f"You can download the receipt from your dashboard.")
+    text = f"Hi {payload['user_name']}, your booking for {what} was rejected."
+    if payload.get("reason"):
+        text += f" Reason: {payload['reason']}"
+    if payload.get("refund"):
+        text += f" A refund of ₹{payload['refund']:.2f} has been issued."
+    return f"Booking #{payload['booking_id']} rejected", text
+
+
+# ------------------ SENDERS ------------------
+
+def send_inbox(payload, config):
+    subject, text = render(payload)
+    db.session.add(InboxMessage(user_id=payload["user_id"], booking_id=payload["booking_id"],
+                                title=subject, body=text))
+
+
+def send_email(payload, config):
+    subject, text = render(payload)
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = config["NOTIFY_FROM"]
+    msg["To"] = payload["email"]
+    msg.set_content(text)
+    with smtplib.SMTP(config["NOTIFY_SMTP_HOST"], config["NOTIFY_SMTP_PORT"], timeout=SEND_TIMEOUT) as smtp:
+        smtp.send_message(msg)
+
+
+def send_webhook(payload, config):
+    req = urllib.request.Request(config["NOTIFY_WEBHOOK_URL"], data=json.dumps(payload).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=SEND_TIMEOUT) as resp:
+        if resp.status >= 300:
+            raise RuntimeError(f"webhook returned HTTP {resp.status}")
+
+
+SENDERS = {"inbox": send_inbox, "email": send_email, "webhook": send_webhook}
+
+
+# ------------------ DISPATCH ------------------
+
+def backoff(attempts):
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+def claim(batch=BATCH):
+    """Take up to `batch` due rows for this dispatcher; returns (token, rows)."""
+    now = datetime.utcnow()
+    due = (db.session.query(Notification.id)
+           .filter(Notification.status == 'pending', Notification.next_attempt_at <= now)
+           .order_by(Notification.next_attempt_at).limit(batch))
+    ids = [i for (i,) in due]
+    if not ids:
+        return None, []
+    token = uuid.uuid4().hex
+    (Notification.query
+     .filter(Notification.id.in_(ids), Notification.status == 'pending', Notification.next_attempt_at <= now)
+     .update({"claimed_by": token, "next_attempt_at": now + LEASE}, synchronize_session=False))
+    db.session.commit()
+    return token, Notification.query.filter_by(claimed_by=token).all()
+
+
+def deliver(n, token, config):
+    # earlier commits in the batch expired `n`, so this re-reads the claim
+    if n.claimed_by != token:
+        log.warning("notification #%s: claim expired before delivery", n.id)
+        metrics.registry.inc("notifications_total", channel=n.channel, result="lost")
+        return "lost"
+    # plain values: a rollback below expires `n`
+    nid, channel, attempts = n.id, n.channel, n.attempts or 0
+    payload = json.loads(n.payload)
+    payload["user_id"] = n.user_id
+    try:
+        SENDERS[channel](payload, config)
+        values = {"status": 'sent', "sent_at": datetime.utcnow()}
+        result = "sent"
+    except Exception as e:
+        db.session.rollback()
+        attempts += 1
+        error = f"{type(e).__name__}: {e}"[:1000]
+        values = {"attempts": attempts, "last_error": error}
+        if attempts >= MAX_ATTEMPTS:
+            values["status"] = 'failed'
+            result = "failed"
+        else:
+            values["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=backoff(attempts))
+            result = "retry"
+        log.warning("notification #%s via %s: %s", nid, channel, error)
+    values["claimed_by"] = None
+    # only while the claim is still ours; if the lease ran out, whoever took
+    # the row over records the outcome (and our inbox row is rolled back)
+    owned = (Notification.query.filter_by(id=nid, claimed_by=token)
+             .update(values, synchronize_session=False))
+    if owned:
+        db.session.commit()
+    else:
+        db.session.rollback()
+        log.warning("notification #%s: claim expired during delivery", nid)
+        result = "lost"
+    metrics.registry.inc("notifications_total", channel=channel, result=result)
+    return result
+
+
+def drain(batch=BATCH):
+    """Deliver every due notification. Returns {result: count}. Needs an app context."""
+    config = current_app.config
+    counts = {}
+    while True:
+        token, rows = claim(batch)
+        for n in rows:
+            result = deliver(n, token, config)
+            counts[result] = counts.get(result, 0) + 1
+        if len(rows) < batch:
+            return counts
+
+
+class Dispatcher:
+    """Background thread draining the outbox every NOTIFY_POLL_SECONDS, or sooner on wake()."""
+
+    def __init__(self, app):
+        self.app = app
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    def start(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            # after a fork the thread object is copied but the thread is gone
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.run, name="notification-dispatcher", daemon=True)
+            self.thread.start()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def run(self):
+        poll = self.app.config["NOTIFY_POLL_SECONDS"]
+        while True:
+            self.wakeup.wait(poll)
+            self.wakeup.clear()
+            with self.app.app_context():
+                try:
+                    drain()
+                except Exception:
+                    log.exception("notification dispatcher pass failed")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+
+_dispatcher = {"current": None}
+
+
+def wake():
+    """Nudge this worker's dispatcher after committing new notifications; never blocks."""
+    d = _dispatcher["current"]
+    if d is not None:
+        d.wake()
+
+
+def init_app(app):
+    app.config.setdefault("NOTIFY_CHANNELS", [c.strip() for c in os.getenv("NOTIFY_CHANNELS", "inbox").split(",") if c.strip()])
+    app.config.setdefault("NOTIFY_SMTP_HOST", os.getenv("NOTIFY_SMTP_HOST", "localhost"))
+    app.config.setdefault("NOTIFY_SMTP_PORT", int(os.getenv("NOTIFY_SMTP_PORT", "1025")))
+    app.config.setdefault("NOTIFY_FROM", os.getenv("NOTIFY_FROM", "bookings@events.local"))
+    app.config.setdefault("NOTIFY_WEBHOOK_URL", os.getenv("NOTIFY_WEBHOOK_URL"))
+    app.config.setdefault("NOTIFY_POLL_SECONDS", float(os.getenv("NOTIFY_POLL_SECONDS", "5")))
+    app.config.setdefault("NOTIFY_DISPATCHER", os.getenv("NOTIFY_DISPATCHER", "thread"))
+
+    unknown = [c for c in app.config["NOTIFY_CHANNELS"] if c not in SENDERS]
+    if unknown:
+        raise ValueError(f"unknown NOTIFY_CHANNELS: {', '.join(unknown)}")
+    if "webhook" in app.config["NOTIFY_CHANNELS"] and not app.config["NOTIFY_WEBHOOK_URL"]:
+        raise ValueError("NOTIFY_CHANNELS includes webhook but NOTIFY_WEBHOOK_URL is not set")
+
+    if app.config["NOTIFY_DISPATCHER"] == "thread":
+        dispatcher = _dispatcher["current"] = Dispatcher(app)
+
+        @app.before_request
+        def _start_dispatcher():
+            dispatcher.start()
@@ -0,0 +1,148 @@
+"""
+Venue/date occupancy index.
+
+Several events share physical venues ("Auditorium 2", "VIP Lounge", ...). A
+VenueOccupancy row records which event holds a venue on a day; the unique
+(venue_key, date) constraint makes the check in book_event a single indexed
+lookup and guarantees two events can never both claim the same slot, even
+under concurrent bookings.
+
+Bookings of the *same* event on a held slot are fine; the row counts them so
+the slot is released when the last one is rejected. Unpaid bookings expire
+after BOOKING_HOLD_MINUTES (app.expire_unpaid_bookings, run for the slot
+when a booking hits a conflict and from `flask expire-unpaid-bookings`), so
+an abandoned checkout cannot hold a venue for good.
+"""
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from models import db, Booking, VenueOccupancy
+
+
+def venue_key(venue):
+    return (venue or "").strip().lower()
+
+
+def claim(venue, day, event_id):
+    """
+    Take (or join) the slot for `event_id`. Returns the id of the other event
+    holding it on conflict, otherwise None. The caller commits.
+    """
+    key = venue_key(venue)
+    row = VenueOccupancy.query.filter_by(venue_key=key, date=day).first()
+    if row is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(VenueOccupancy(venue_key=key, date=day, event_id=event_id, bookings=1))
+            return None
+        except IntegrityError:
+            # lost a race with a concurrent booking; fall through and re-check
+            row = VenueOccupancy.query.filter_by(venue_key=key, date=day).first()
+            if row is None:
+                raise
+    if row.event_id != event_id:
+        return row.event_id
+    # in SQL, so concurrent bookings of the same slot can't lose an increment
+    (VenueOccupancy.query.filter_by(id=row.id)
+     .update({VenueOccupancy.bookings: db.func.coalesce(VenueOccupancy.bookings, 0) + 1},
+             synchronize_session=False))
+    return None
+
+
+def release(venue, day, event_id):
+    """Drop one booking's hold on the slot; frees it when none are left."""
+    key = venue_key(venue)
+    held = VenueOccupancy.query.filter_by(venue_key=key, date=day, event_id=event_id)
+    held.update({VenueOccupancy.bookings: db.func.coalesce(VenueOccupancy.bookings, 0) - 1},
+                synchronize_session=False)
+    held.filter(VenueOccupancy.bookings <= 0).delete(synchronize_session=False)
+
+
+def release_event(event_id):
+    VenueOccupancy.query.filter_by(event_id=event_id).delete()
+
+
+def conflicts_for_dates(available_dates, event_id=None):
+    """
+    Check an available_dates mapping (venue -> [YYYY-MM-DD]) against slots
+    held by other events. Returns a sorted list of (venue, date, holder_event_id).
+    """
+    wanted = {}
+    for venue, dates in (available_dates or {}).items():
+        for d in dates or []:
+            try:
+                day = datetime.strptime(str(d), "%Y-%m-%d").date()
+            except ValueError:
+                continue
+            wanted[(venue_key(venue), day)] = venue
+    if not wanted:
+        return []
+
+    out = []
+    for (key, day), holder in held_slots(wanted).items():
+        if holder != event_id:
+            out.append((wanted[(key, day)], day.isoformat(), holder))
+    return sorted(out)
+
+
+def held_slots(slots):
+    """Map each held (venue_key, date) among `slots` to the event holding it."""
+    slots = set(slots)
+    if not slots:
+        return {}
+    keys = {k for k, _ in slots}
+    days = {d for _, d in slots}
+    q = (db.session.query(VenueOccupancy.venue_key, VenueOccupancy.date, VenueOccupancy.event_id)
+         .filter(VenueOccupancy.venue_key.in_(keys), VenueOccupancy.date.in_(days)))
+    return {(k, d): e for k, d, e in q if (k, d) in slots}
+
+
+def _slot_groups():
+    """
+    {(venue_key, date): [(event_id, live bookings, first booking id), ...]}
+    sorted by first booking. Keys are made with venue_key() in Python: SQL
+    lower()/trim() only fold ASCII and spaces, so they would disagree with
+    the keys claim() writes for other names.
+    """
+    rows = (
+        db.session.query(Booking.venue, Booking.date, Booking.event_id,
+                         db.func.count(Booking.id), db.func.min(Booking.id))
+        .filter(Booking.status != 'Rejected', Booking.venue.isnot(None))
+        .group_by(Booking.venue, Booking.date, Booking.event_id)
+        .yield_per(10000)
+    )
+    slots = {}
+    for venue, day, event_id, n, first in rows:
+        per_event = slots.setdefault((venue_key(venue), day), {})
+        # spellings of one venue ("Hall A", "hall a ") collapse into one slot
+        prev = per_event.get(event_id)
+        per_event[event_id] = (n, first) if prev is None else (prev[0] + n, min(prev[1], first))
+    return {slot: sorted(((e, n, first) for e, (n, first) in per_event.items()), key=lambda r: r[2])
+            for slot, per_event in slots.items()}
+
+
+def find_collisions(rebuild=False):
+    """
+    Scan live bookings for venue/date slots claimed by more than one event.
+
+    The work is a single GROUP BY over live bookings, folded into slots in
+    Python, so memory stays proportional to the number of slots. The event
+    with the earliest booking is treated as the rightful holder. With
+    `rebuild`, the occupancy table is regenerated from the same pass.
+
+    Returns a list of dicts: venue_key, date, holder_event_id, other_event_ids.
+    """
+    collisions = []
+    holders = []
+    for (vkey, day), events in sorted(_slot_groups().items()):
+        holder_id, n, _first = events[0]
+        holders.append({"venue_key": vkey, "date": day, "event_id": holder_id, "bookings": n})
+        if len(events) > 1:
+            collisions.append({"venue_key": vkey, "date": day, "holder_event_id": holder_id,
+                               "other_event_ids": [e for e, _, _ in events[1:]]})
+
+    if rebuild:
+        VenueOccupancy.query.delete()
+        for i in range(0, len(holders), 10000):
+            db.session.execute(VenueOccupancy.__table__.insert(), holders[i:i + 10000])
+        db.session.commit()
+    return collisions
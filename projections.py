@@ -0,0 +1,72 @@
+"""
+Read-only row projections for the admin and user list pages.
+
+The list views used to load full ORM entities: each row went through the
+identity map and dragged along columns the pages never show (Event.available_dates,
+User.password) plus a lazy load per row for booking.user / booking.event.
+The functions here select only the displayed columns, with the joined
+user/event names, in a single query and return plain namedtuples, which
+templates read with the same attribute syntax. `price` is what the booking
+was charged (its amount), falling back to the event's price for bookings
+made before amounts were recorded. Pass `limit` rather than
+limiting the query first: the joins have to go in before the LIMIT.
+
+Rows are not attached to the session, so nothing in them can be modified or
+lazily loaded; views that write use the models as before.
+"""
+from collections import namedtuple
+from models import db, User, Event, Booking, BookingArchive
+import archive
+
+BookingRow = namedtuple("BookingRow", [
+    "id", "date", "venue", "status", "paid", "payment_reference", "is_upcoming",
+    "archived_at", "user_email", "event_name", "price",
+])
+UserRow = namedtuple("UserRow", ["id", "name", "email", "bookings", "created_at"])
+EventRow = namedtuple("EventRow", ["id", "name", "category", "price", "available_days", "available_venues"])
+
+
+def _booking_columns(model, archived_at, event_name, price):
+    return (model.id, model.date, model.venue, model.status, model.paid, model.payment_reference,
+            model.is_upcoming, archived_at, User.email, event_name, price)
+
+
+def booking_rows(query, limit=None):
+    """BookingRows for a Booking query (filters and ordering are kept)."""
+    q = (query.join(User, User.id == Booking.user_id)
+              .join(Event, Event.id == Booking.event_id)
+              .with_entities(*_booking_columns(Booking, db.null(), Event.name,
+                                               db.func.coalesce(Booking.amount, Event.price)))
+              .limit(limit))
+    return [BookingRow._make(r) for r in q]
+
+
+def archived_booking_rows(user_id):
+    """BookingRows for a user's archived bookings, most recent date first (all older than any hot booking)."""
+    q = (db.session.query(*_booking_columns(BookingArchive, BookingArchive.archived_at,
+                                            db.func.coalesce(BookingArchive.event_name, Event.name),
+                                            db.func.coalesce(BookingArchive.amount, BookingArchive.event_price,
+                                                             Event.price)))
+         .join(User, User.id == BookingArchive.user_id)
+         # no FK to event: a deleted event leaves only the snapshot taken at archival
+         .outerjoin(Event, Event.id == BookingArchive.event_id)
+         .filter(BookingArchive.user_id == user_id)
+         .order_by(BookingArchive.date.desc(), BookingArchive.id.desc()))
+    return [BookingRow._make(r) for r in q]
+
+
+def user_rows(query, limit=None):
+    """UserRows, with the number of bookings (live and archived), for a User query."""
+    counts = archive.booking_counts_by_user()
+    q = (query.outerjoin(counts, counts.c.user_id == User.id)
+              .with_entities(User.id, User.name, User.email,
+                             db.func.coalesce(counts.c.n, 0), User.created_at)
+              .limit(limit))
+    return [UserRow._make(r) for r in q]
+
+
+def event_rows(query, limit=None):
+    """EventRows for an Event query."""
+    q = query.with_entities(Event.id, Event.name, Event.category, Event.price,
+                            Event.available_days, Event.available_venues).limit(limit)
+    return [EventRow._make(r) for r in q]
@@ -0,0 +1,221 @@
+"""
+Admission control for expensive endpoints.
+
+Each rule combines
+
+    a token bucket per (rule, client)   `rate` requests per `per` seconds,
+                                        bursts of up to `burst`
+    a concurrency cap per rule          at most `concurrency` requests in
+                                        flight in this worker process
+
+and rejects with 429 + Retry-After from a before_request hook, ahead of the
+app's other hooks and before the view does any work, so a burst of logins
+(bcrypt) or receipts (PDF) cannot occupy every worker thread. The
+client is the logged-in user, or the remote address for anonymous requests.
+Behind N reverse proxies set RATELIMIT_TRUST_PROXY=N: the address is then
+the Nth X-Forwarded-For entry from the right, the one appended by the
+outermost trusted proxy (as werkzeug's ProxyFix(x_for=N)). Entries further
+left are sent by the client and are not trusted.
+
+Buckets live in process memory by default. RATELIMIT_STORAGE_URL points them
+at a store shared by all workers instead: sqlite:////path/ratelimit.db or
+redis://host:6379/0 (needs the redis package). Rules can be tuned with
+app.config["RATELIMITS"] = {"login": {"rate": 20, "concurrency": 8}, ...};
+RATELIMIT_ENABLED=0 turns everything off.
+"""
+import os, math, time, sqlite3, threading
+from flask import current_app, request, g, jsonify, Response
+from flask_login import current_user
+import metrics
+
+RULES = {
+    # name: rate per `per` seconds, burst, concurrent requests per worker, limited methods
+    "login": {"rate": 10, "per": 60, "burst": 10, "concurrency": 4, "methods": ("POST",)},
+    "register": {"rate": 5, "per": 60, "burst": 5, "concurrency": 2, "methods": ("POST",)},
+    "admin_login": {"rate": 5, "per": 60, "burst": 5, "concurrency": 2, "methods": ("POST",)},
+    "download_receipt": {"rate": 20, "per": 60, "burst": 10, "concurrency": 2, "methods": None},
+    "api_stats": {"rate": 30, "per": 60, "burst": 10, "concurrency": 4, "methods": None},
+    "api_availability": {"rate": 60, "per": 60, "burst": 20, "concurrency": 4, "methods": None},
+}
+
+metrics.registry.describe("ratelimit_rejected_total", "counter", "Requests rejected with 429 by rule and reason.")
+
+
+# ------------------ BUCKET STORES ------------------
+
+def _refill(tokens, updated, now, rate, burst):
+    """Token bucket step: returns (tokens left, seconds to wait; 0 when admitted)."""
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryStore:
+    PRUNE_EVERY = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}  # key -> (tokens, updated, seconds until full)
+        self.calls = 0
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated, _ = self.buckets.get(key, (burst, now, 0))
+            tokens, wait = _refill(tokens, updated, now, rate, burst)
+            self.buckets[key] = (tokens, now, (burst - tokens) / rate)
+            self.calls += 1
+            if self.calls % self.PRUNE_EVERY == 0:
+                # a bucket that has refilled completely is the same as no bucket
+                self.buckets = {k: v for k, v in self.buckets.items() if now - v[1] < v[2]}
+        return wait
+
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self._conn().execute("CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens, wait = _refill(*(row or (burst, now)), now, rate, burst)
+            conn.execute("INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class RedisStore:
+    # same arithmetic as _refill, run atomically inside Redis
+    SCRIPT = """
+    local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + (now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATELIMIT_STORAGE_URL points at Redis but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key, rate, burst):
+        return float(self.script(keys=[f"ratelimit:{key}"], args=[rate, burst, time.time()]))
+
+
+def make_store(url):
+    url = url or "memory://"
+    if url.startswith("memory://"):
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    raise ValueError(f"unsupported RATELIMIT_STORAGE_URL {url!r}")
+
+
+# ------------------ DECORATOR ------------------
+
+def _slots(rules):
+    return {name: threading.BoundedSemaphore(rule["concurrency"]) for name, rule in rules.items()}
+
+
+_state = {"store": MemoryStore(), "slots": _slots(RULES), "rules": dict(RULES)}
+
+
+def client_id():
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    hops = current_app.config["RATELIMIT_TRUST_PROXY"]
+    if hops:
+        forwarded = [h.strip() for h in request.headers.get("X-Forwarded-For", "").split(",") if h.strip()]
+        if len(forwarded) >= hops:
+            return f"ip:{forwarded[-hops]}"
+    return f"ip:{request.remote_addr}"
+
+
+def too_many(name, reason, retry_after):
+    metrics.registry.inc("ratelimit_rejected_total", rule=name, reason=reason)
+    retry_after = max(1, math.ceil(retry_after))
+    if request.path.startswith("/api/"):
+        resp = jsonify({"error": "too many requests", "retry_after": retry_after})
+        resp.status_code = 429
+    else:
+        resp = Response(f"Too many requests. Please try again in {retry_after} second(s).\n",
+                        status=429, mimetype="text/plain")
+    resp.headers["Retry-After"] = str(retry_after)
+    return resp
+
+
+def limit(name):
+    """Attach rule `name` from RULES to a view; enforced by the before_request hook."""
+    def decorator(view):
+        view._ratelimit_rule = name
+        return view
+    return decorator
+
+
+def admit():
+    """Return a 429 response if the request must be turned away, else None."""
+    view = current_app.view_functions.get(request.endpoint)
+    name = getattr(view, "_ratelimit_rule", None)
+    if name is None or not current_app.config["RATELIMIT_ENABLED"]:
+        return None
+    rule = _state["rules"][name]
+    if rule["methods"] and request.method not in rule["methods"]:
+        return None
+
+    wait = _state["store"].take(f"{name}:{client_id()}", rule["rate"] / rule["per"], rule["burst"])
+    if wait > 0:
+        return too_many(name, "rate", wait)
+    slots = _state["slots"][name]
+    if not slots.acquire(blocking=False):
+        return too_many(name, "concurrency", 1)
+    g._ratelimit_slot = slots
+    return None
+
+
+def init_app(app):
+    app.config.setdefault("RATELIMIT_ENABLED", os.getenv("RATELIMIT_ENABLED", "1") == "1")
+    app.config.setdefault("RATELIMIT_STORAGE_URL", os.getenv("RATELIMIT_STORAGE_URL", "memory://"))
+    app.config.setdefault("RATELIMIT_TRUST_PROXY", int(os.getenv("RATELIMIT_TRUST_PROXY", "0")))
+    app.config.setdefault("RATELIMITS", {})
+    rules = {name: dict(rule, **app.config["RATELIMITS"].get(name, {})) for name, rule in RULES.items()}
+    _state["rules"] = rules
+    _state["store"] = make_store(app.config["RATELIMIT_STORAGE_URL"])
+    _state["slots"] = _slots(rules)
+
+    @app.before_request
+    def _ratelimit_admit():
+        return admit()
+
+    @app.teardown_request
+    def _ratelimit_release(exc):
+        slots = g.pop("_ratelimit_slot", None)
+        if slots is not None:
+            slots.release()
@@ -0,0 +1,169 @@
+"""
+PDF receipt rendering.
+
+ReportLab is only needed by download_receipt, so app.py imports this module on
+first use instead of paying the ReportLab import on every worker boot and CLI
+invocation. prewarm() lets a gunicorn post_fork hook load it ahead of traffic
+(see gunicorn.conf.py).
+"""
+import io
+from datetime import datetime
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from metrics import timed
+
+
+def prewarm():
+    """Build a throwaway document so ReportLab's fonts and styles are loaded."""
+    doc = SimpleDocTemplate(io.BytesIO(), pagesize=letter)
+    doc.build([Paragraph("warm-up", getSampleStyleSheet()["Normal"])])
+
+
+def build_receipt(booking):
+    """Render the payment receipt for `booking` (a Booking or BookingArchive) and return it as a BytesIO."""
+    buffer = io.BytesIO()
+    # archived bookings keep a snapshot of their event, which may since have been deleted
+    event = booking.event
+    event_name = getattr(booking, "event_name", None) or (event.name if event is not None else "Deleted event")
+    amount = booking.amount
+    if amount is None:
+        amount = getattr(booking, "event_price", None)
+    if amount is None:
+        amount = event.price if event is not None else 0.0
+
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=40, leftMargin=40,
+        topMargin=60, bottomMargin=40
+    )
+
+    styles = getSampleStyleSheet()
+    normal = styles["Normal"]
+    normal.fontName = "Helvetica"
+    normal.fontSize = 11
+    normal.leading = 14
+
+    PRIMARY = colors.HexColor("#5b2c6f")
+    DARKGREY = colors.HexColor("#2c2c2c")
+    LIGHTGREY = colors.HexColor("#f2f2f2")
+
+    title_style = ParagraphStyle(
+        name="TitleStyle",
+        fontName="Helvetica-Bold",
+        fontSize=22,
+        leading=26,
+        textColor=PRIMARY,
+        alignment=1,
+        spaceAfter=20
+    )
+
+    section_title = ParagraphStyle(
+        name="SectionTitle",
+        fontName="Helvetica-Bold",
+        fontSize=14,
+        textColor=PRIMARY,
+        spaceAfter=10
+    )
+
+    story = []
+    story.append(Paragraph("Prestige Planners – Payment Receipt", title_style))
+    story.append(Spacer(1, 10))
+
+    invoice_info_data = [
+        ["Receipt No.:", f"#{booking.id}"],
+        ["Generated On:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
+        ["Payment Ref:", booking.payment_reference]
+    ]
+
+    invoice_table = Table(invoice_info_data, colWidths=[120, 350])
+    invoice_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), LIGHTGREY),
+        ('TEXTCOLOR', (0, 0), (-1, -1), DARKGREY),
+        ('BOX', (0, 0), (-1, -1), 1, colors.grey),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 8),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ]))
+
+    story.append(invoice_table)
+    story.append(Spacer(1, 20))
+
+    story.append(Paragraph("Customer Details", section_title))
+    customer_data = [
+        ["Name:", booking.user.name],
+        ["Email:", booking.user.email],
+    ]
+    cust_table = Table(customer_data, colWidths=[120, 350])
+    cust_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+        ('TEXTCOLOR', (0, 0), (-1, -1), DARKGREY),
+        ('BOX', (0, 0), (-1, -1), 1, colors.grey),
+        ('LEFTPADDING', (0, 0), (-1, -1), 8),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ]))
+
+    story.append(cust_table)
+    story.append(Spacer(1, 20))
+
+    story.append(Paragraph("Event Details", section_title))
+    event_data = [
+        ["Event Name:", event_name],
+        ["Venue:", booking.venue],
+        ["Selected Date:", booking.date.isoformat()],
+    ]
+    event_table = Table(event_data, colWidths=[120, 350])
+    event_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+        ('TEXTCOLOR', (0, 0), (-1, -1), DARKGREY),
+        ('BOX', (0, 0), (-1, -1), 1, colors.grey),
+        ('LEFTPADDING', (0, 0), (-1, -1), 8),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ]))
+
+    story.append(event_table)
+    story.append(Spacer(1, 25))
+
+    story.append(Paragraph("Payment Summary", section_title))
+    price_data = [
+        ["Description", "Amount (Rs.)"],
+        [
+            Paragraph(f"{event_name} Booking Fee", normal),
+            Paragraph(f"{amount:.2f}", normal)
+        ]
+    ]
+    price_table = Table(price_data, colWidths=[350, 120])
+    price_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), PRIMARY),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), "Helvetica-Bold"),
+        ('BACKGROUND', (0, 1), (-1, -1), LIGHTGREY),
+        ('TEXTCOLOR', (0, 1), (-1, -1), DARKGREY),
+        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 10),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+        ('BOX', (0, 0), (-1, -1), 1, colors.grey),
+        ('INNERGRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('NOSPLIT', (0, 0), (-1, -1)),
+    ]))
+
+    story.append(price_table)
+    story.append(Spacer(1, 35))
+
+    thank_style = ParagraphStyle(
+        name="Thanks",
+        fontName="Helvetica-Oblique",
+        fontSize=12,
+        textColor=PRIMARY,
+        alignment=1,
+    )
+    story.append(Paragraph("Thank you for choosing Prestige Planners!", thank_style))
+
+    with timed("receipt_pdf"):
+        doc.build(story)
+
+    buffer.seek(0)
+    return buffer
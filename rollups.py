@@ -0,0 +1,155 @@
+"""
+Daily booking/revenue rollups.
+
+DailyRollup holds one row per (day, event, category, venue) with counts of
+bookings created, paid, approved, rejected and refunded, and net revenue at
+the price actually charged (Booking.amount). The request handlers bump the
+row for "today" inside the same transaction as the booking change, so the
+stats page and /api/analytics read a few rollup rows instead of scanning
+Booking. rebuild() recomputes a date range from the bookings table and its
+archive.
+"""
+from datetime import datetime, date, timedelta
+from sqlalchemy.exc import IntegrityError
+from models import db, Booking, BookingArchive, Event, DailyRollup
+
+COUNTERS = ("bookings", "paid", "approved", "rejected", "refunded", "revenue")
+
+GROUPS = {
+    "day": (DailyRollup.day,),
+    "event": (DailyRollup.event_id,),
+    "category": (DailyRollup.category,),
+    "venue": (DailyRollup.venue,),
+}
+
+
+def bump(event, venue, day=None, **deltas):
+    """Add `deltas` (e.g. paid=1, revenue=500.0) to today's row for event/venue. The caller commits."""
+    day = day or datetime.utcnow().date()
+    key = dict(day=day, event_id=event.id, category=event.category or '', venue=venue or '')
+    values = {getattr(DailyRollup, k): getattr(DailyRollup, k) + v for k, v in deltas.items()}
+    if DailyRollup.query.filter_by(**key).update(values, synchronize_session=False):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(DailyRollup(**key, **{k: deltas.get(k, 0) for k in COUNTERS}))
+    except IntegrityError:
+        # a concurrent request created the row first
+        DailyRollup.query.filter_by(**key).update(values, synchronize_session=False)
+
+
+def _day(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _accumulate(totals, model, start, end, batch):
+    """Add the rollup counters computed from `model` (Booking or BookingArchive) into `totals`."""
+    # outer join: archived bookings outlive their event, and carry a snapshot of it
+    if model is BookingArchive:
+        event_category = db.func.coalesce(model.event_category, Event.category)
+        price = db.func.coalesce(model.amount, model.event_price, Event.price)
+    else:
+        event_category = Event.category
+        price = db.func.coalesce(model.amount, Event.price)
+    paid_ts = db.func.coalesce(model.paid_at, model.created_at)
+    decided_ts = db.func.coalesce(model.decided_at, model.created_at)
+    refunded = db.and_(model.status == 'Rejected', model.paid_at.isnot(None))
+    is_paid = db.or_(model.paid == True, model.paid_at.isnot(None))
+
+    # (counter, timestamp expression, filter, value expression)
+    parts = [
+        ("bookings", model.created_at, None, db.func.count(model.id)),
+        ("paid", paid_ts, is_paid, db.func.count(model.id)),
+        ("revenue", paid_ts, is_paid, db.func.sum(price)),
+        ("approved", decided_ts, model.status == 'Approved', db.func.count(model.id)),
+        ("rejected", decided_ts, model.status == 'Rejected', db.func.count(model.id)),
+        ("refunded", decided_ts, refunded, db.func.count(model.id)),
+        ("revenue_refunded", decided_ts, refunded, db.func.sum(price)),
+    ]
+
+    for counter, ts, cond, value in parts:
+        day_expr = db.func.date(ts)
+        q = (db.session.query(day_expr, model.event_id, event_category, model.venue, value)
+             .outerjoin(Event, Event.id == model.event_id))
+        if cond is not None:
+            q = q.filter(cond)
+        if start:
+            q = q.filter(ts >= datetime.combine(start, datetime.min.time()))
+        if end:
+            q = q.filter(ts < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        q = q.group_by(day_expr, model.event_id, event_category, model.venue)
+        for day, event_id, category, venue, v in q.yield_per(batch):
+            key = (_day(day), event_id, category or '', venue or '')
+            row = totals.get(key)
+            if row is None:
+                row = totals[key] = {"bookings": 0, "paid": 0, "approved": 0, "rejected": 0,
+                                     "refunded": 0, "revenue": 0.0}
+            if counter == "revenue_refunded":
+                row["revenue"] -= float(v or 0)
+            elif counter == "revenue":
+                row["revenue"] += float(v or 0)
+            else:
+                row[counter] += int(v or 0)
+
+
+def rebuild(start=None, end=None, batch=10000):
+    """
+    Recompute rollups for [start, end] (inclusive dates, default: everything)
+    from the bookings table and the booking archive. Each counter is attributed to the day its action
+    happened: created_at for bookings, paid_at for payments, decided_at for
+    approvals/rejections, falling back to created_at for rows that predate
+    those timestamps. Only a booking's final status is visible here, so an
+    approval later overturned by a rejection counts as a rejection alone.
+    Returns the number of rollup rows written.
+    """
+    totals = {}
+    for model in (Booking, BookingArchive):
+        _accumulate(totals, model, start, end, batch)
+
+    q = DailyRollup.query
+    if start:
+        q = q.filter(DailyRollup.day >= start)
+    if end:
+        q = q.filter(DailyRollup.day <= end)
+    q.delete(synchronize_session=False)
+
+    rows = [dict(day=k[0], event_id=k[1], category=k[2], venue=k[3], **v) for k, v in totals.items()]
+    for i in range(0, len(rows), batch):
+        db.session.execute(DailyRollup.__table__.insert(), rows[i:i + batch])
+    db.session.commit()
+    return len(rows)
+
+
+def total_revenue():
+    return db.session.query(db.func.coalesce(db.func.sum(DailyRollup.revenue), 0)).scalar() or 0
+
+
+def query(start=None, end=None, group="day"):
+    """Range query over the rollups, grouped by day, event, category or venue."""
+    cols = GROUPS[group]
+    sums = [db.func.coalesce(db.func.sum(getattr(DailyRollup, c)), 0).label(c) for c in COUNTERS]
+    q = db.session.query(*cols, *sums)
+    if start:
+        q = q.filter(DailyRollup.day >= start)
+    if end:
+        q = q.filter(DailyRollup.day <= end)
+    rows = q.group_by(*cols).order_by(*cols).all()
+
+    names = {}
+    if group == "event":
+        ids = [r[0] for r in rows]
+        if ids:
+            names = dict(db.session.query(Event.id, Event.name).filter(Event.id.in_(ids)).all())
+
+    out = []
+    for r in rows:
+        key = r[0].isoformat() if group == "day" else r[0]
+        item = {group: key}
+        if group == "event":
+            item["name"] = names.get(r[0])
+        for c, v in zip(COUNTERS, r[1:]):
+            item[c] = round(float(v), 2) if c == "revenue" else int(v)
+        out.append(item)
+    return out
@@ -0,0 +1,150 @@
+"""
+Slow-query log and N+1 detector.
+
+Hooks SQLAlchemy's before/after_cursor_execute events and writes findings as
+JSON lines to a dedicated log (SQL_FINDINGS_LOG):
+
+    slow   a statement that took longer than SLOW_QUERY_MS, with its route
+           and parameter types (never values: they include emails and
+           password hashes)
+    n+1    a request that issued the same statement shape more than
+           NPLUS1_THRESHOLD times (typically lazy Booking.user / Booking.event
+           loads inside a template loop)
+
+read_findings() aggregates the log for the /admin/sql page. Because every
+worker appends to the same file the summary covers the whole deployment.
+Workers only append (short lines, O_APPEND) and never rotate the file
+themselves, since several processes renaming it would lose lines; rotate it
+externally, e.g. with logrotate, and each worker reopens it on its next write
+(WatchedFileHandler).
+"""
+import os, re, json, time, logging
+from collections import Counter
+from datetime import datetime
+from logging.handlers import WatchedFileHandler
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("sqlwatch")
+logger.propagate = False
+
+_settings = {"slow_ms": 200.0, "nplus1": 10, "log_file": None}
+
+_WS = re.compile(r"\s+")
+_IN_LIST = re.compile(r"IN \((?:\?|%\(\w+\)s|:\w+)(?:, (?:\?|%\(\w+\)s|:\w+))*\)", re.I)
+_LITERAL_IN = re.compile(r"IN \(__\[POSTCOMPILE_\w+\]\)", re.I)
+
+
+def statement_shape(statement):
+    """Collapse whitespace and IN-lists so repeated queries compare equal."""
+    shape = _WS.sub(" ", statement).strip()
+    shape = _IN_LIST.sub("IN (?)", shape)
+    return _LITERAL_IN.sub("IN (?)", shape)
+
+
+def _route():
+    if has_request_context():
+        return request.endpoint or request.path
+    return None
+
+
+def param_types(parameters, executemany=False):
+    """Parameter count and types, e.g. "3 params: int, str, NoneType"; values are left out."""
+    if executemany:
+        rows = list(parameters or ())
+        first = param_types(rows[0]) if rows else "0 params"
+        return f"{len(rows)} rows of {first}"
+    if isinstance(parameters, dict):
+        types = [f"{k}={type(v).__name__}" for k, v in parameters.items()]
+    else:
+        types = [type(v).__name__ for v in parameters or ()]
+    return f"{len(types)} params" + (": " + ", ".join(types) if types else "")
+
+
+def _write(finding):
+    finding["ts"] = datetime.utcnow().isoformat()
+    logger.warning(json.dumps(finding, default=str))
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before(conn, cursor, statement, parameters, context, executemany):
+    context._sqlwatch_start = time.perf_counter()  # per statement, see metrics._before_cursor_execute
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._sqlwatch_start) * 1000
+    if has_request_context():
+        shapes = g.get("_sql_shapes")
+        if shapes is None:
+            shapes = g._sql_shapes = Counter()
+        shapes[statement_shape(statement)] += 1
+    if elapsed_ms >= _settings["slow_ms"]:
+        _write({
+            "kind": "slow",
+            "route": _route(),
+            "ms": round(elapsed_ms, 2),
+            "statement": statement_shape(statement),
+            "params": param_types(parameters, executemany)[:500],
+        })
+
+
+def _check_request(exc=None):
+    shapes = g.pop("_sql_shapes", None)
+    if not shapes:
+        return
+    limit = _settings["nplus1"]
+    for shape, n in shapes.items():
+        if n > limit:
+            _write({"kind": "n+1", "route": _route(), "count": n, "statement": shape})
+
+
+def init_app(app):
+    app.config.setdefault("SLOW_QUERY_MS", float(os.getenv("SLOW_QUERY_MS", "200")))
+    app.config.setdefault("NPLUS1_THRESHOLD", int(os.getenv("NPLUS1_THRESHOLD", "10")))
+    app.config.setdefault("SQL_FINDINGS_LOG", os.getenv("SQL_FINDINGS_LOG", os.path.join(app.root_path, "sql_findings.log")))
+
+    _settings["slow_ms"] = app.config["SLOW_QUERY_MS"]
+    _settings["nplus1"] = app.config["NPLUS1_THRESHOLD"]
+    _settings["log_file"] = app.config["SQL_FINDINGS_LOG"]
+
+    if not logger.handlers:
+        handler = WatchedFileHandler(_settings["log_file"], encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.WARNING)
+
+    app.teardown_request(_check_request)
+
+
+def read_findings(limit_lines=5000):
+    """
+    Summarise the current findings log, grouped by (kind, route, statement).
+    Returns a list of dicts sorted by occurrences, most frequent first.
+    """
+    path = _settings["log_file"]
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()[-limit_lines:]
+    groups = {}
+    for ln in lines:
+        try:
+            item = json.loads(ln)
+        except ValueError:
+            continue
+        key = (item.get("kind"), item.get("route"), item.get("statement"))
+        grp = groups.get(key)
+        if grp is None:
+            grp = groups[key] = {
+                "kind": key[0], "route": key[1], "statement": key[2],
+                "occurrences": 0, "worst": 0, "last_seen": "", "params": "",
+            }
+        grp["occurrences"] += 1
+        worst = item.get("ms") if key[0] == "slow" else item.get("count")
+        if worst and worst > grp["worst"]:
+            grp["worst"] = worst
+            grp["params"] = item.get("params", "")
+        grp["last_seen"] = max(grp["last_seen"], item.get("ts", ""))
+    return sorted(groups.values(), key=lambda x: (x["occurrences"], x["worst"]), reverse=True)